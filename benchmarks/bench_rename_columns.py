@@ -0,0 +1,128 @@
+"""
+UnifiedTransformer._rename_columns 的微基準測試。
+
+以合成的 join 後暫存表（預設 500,000 筆）比較：
+- 現行作法：`_rename_columns` 先算好所有輸出欄位，再一次建構 DataFrame。
+- 逐欄插入：把相同的輸出欄位依序插入空的 `pd.DataFrame()`（舊版 `_rename_columns` 的組裝方式，缺少的航段以 None 補齊）。
+
+執行方式（於專案根目錄）：
+    python -m benchmarks.bench_rename_columns [筆數]
+"""
+# 標準庫
+import sys
+import time
+import tracemalloc
+
+# 外部庫
+import numpy as np
+import pandas as pd
+
+# 本地庫
+from etl.transform.unified_transformer import UnifiedTransformer
+
+
+def build_joined_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    建立 `_rename_columns` 輸入格式的合成資料：第一段航段有值，第二、三段大多為空，欄位基數與實際資料相近。
+
+    參數:
+        rows (int): 筆數。
+        seed (int): 亂數種子。
+
+    返回:
+        pd.DataFrame: 合成的 join 後暫存表。
+    """
+    rng = np.random.default_rng(seed)
+
+    def pick(values, null_ratio: float = 0.0):
+        column = rng.choice(np.array(values, dtype=object), rows)
+        if null_ratio:
+            column[rng.random(rows) < null_ratio] = None
+        return column
+
+    flight_numbers = [f'{code}{number:03d}' for code in ('CI', 'BR', 'JX', 'CX', 'NH') for number in range(1, 120)]
+    times = [f'2025-11-{day:02d} {hour:02d}:{minute:02d}:00' for day in range(1, 29) for hour in range(24) for minute in (0, 30)]
+    airports = ['TPE 桃園', 'KHH 高雄', 'NRT 成田', 'HND 羽田', 'HKG 香港', 'BKK 曼谷']
+    durations = [f'0 days {hour:02d}:{minute:02d}:00' for hour in range(1, 15) for minute in (0, 15, 30, 45)]
+
+    data = {}
+    for leg in ('去程', '回程'):
+        for i in (1, 2, 3):
+            null_ratio = 0.0 if i == 1 else 0.8
+            data[f'{leg}_航班編號{i}'] = pick(flight_numbers, null_ratio)
+            data[f'{leg}_艙等{i}'] = pick(['經濟艙K', '經濟艙Y', '商務艙C'], null_ratio)
+            data[f'{leg}_出發時間{i}'] = pick(times, null_ratio)
+            data[f'{leg}_到達時間{i}'] = pick(times, null_ratio)
+            data[f'{leg}_出發機場{i}'] = pick(airports, null_ratio)
+            data[f'{leg}_到達機場{i}'] = pick(airports, null_ratio)
+            data[f'{leg}_機型{i}'] = pick(['A321', 'B738', 'A350', 'B789'], null_ratio)
+            data[f'{leg}_飛行時間{i}'] = pick(durations, null_ratio)
+            data[f'{leg}行李數值{i}'] = rng.choice(np.array([1.0, 2.0, 20.0, 23.0, np.nan]), rows)
+            data[f'{leg}行李單位{i}'] = pick(['件', '公斤', ''])
+    data['GDS_Type'] = pick(['1A', '1S', '1B'])
+    for column in ('機票價錢', '稅金', '最終價格'):
+        data[column] = rng.integers(1000, 50000, rows).astype('float64')
+    for column in ('機票價錢加價成數', '稅金加價成數'):
+        data[column] = rng.random(rows)
+    data['出發日期'] = pick([f'2025/11/{day:02d}' for day in range(1, 29)])
+    data['返回日期'] = pick([f'2025/12/{day:02d}' for day in range(1, 29)])
+    data['建立時間'] = rng.integers(1_700_000_000, 1_800_000_000, rows).astype('float64')
+    for supplier in ('settour_air_tickets_price', 'settour_tax', 'lion_air_tickets_price', 'lion_tax',
+                     'eztravel_ticket_air_tickets_price', 'eztravel_tax', 'rich_mond_air_tickets_price', 'rich_mond_tax'):
+        column = rng.integers(1000, 50000, rows).astype('float64')
+        column[rng.random(rows) < 0.3] = np.nan
+        data[supplier] = column
+    data['淨價或票面'] = pick(['淨價', '票面'])
+    data['票價規則類型'] = pick(['A', 'B', 'C'])
+    data['KP'] = pick(['', '3', '5'])
+    data['折扣'] = rng.random(rows)
+    data['固定金額'] = rng.integers(0, 500, rows).astype('float64')
+    return pd.DataFrame(data)
+
+
+def assemble_incrementally(columns: dict) -> pd.DataFrame:
+    """
+    以舊版方式組裝：自空 DataFrame 逐欄插入，全空欄位以純量 None 補齊。
+    """
+    new_df = pd.DataFrame()
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray) and values.dtype.kind in 'fO' and pd.isna(values).all():
+            new_df[name] = None
+        else:
+            new_df[name] = values
+    return new_df
+
+
+def measure(label: str, func, *args):
+    """
+    執行一次並回報耗時與 Python 端配置的峰值記憶體。
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:8.3f} 秒   峰值 {peak / 1024 ** 2:8.1f} MiB")
+    return result
+
+
+def main(rows: int = 500_000):
+    transformer = UnifiedTransformer()
+    joined = build_joined_frame(rows)
+    print(f"輸入：{rows} 筆 x {joined.shape[1]} 欄")
+
+    # 先暖身一次，讓解析快取與 numpy/pandas 的一次性成本不計入比較
+    transformer._rename_columns(joined.head(1000))
+
+    output = measure('_rename_columns（一次建構）', transformer._rename_columns, joined)
+    columns = {name: output[name].to_numpy() for name in output.columns}
+    legacy = measure('逐欄插入組裝', assemble_incrementally, columns)
+    rebuilt = measure('一次建構組裝', lambda data: pd.DataFrame(data, copy=False), columns)
+
+    print(f"輸出：{output.shape[0]} 筆 x {output.shape[1]} 欄；"
+          f"object 欄位 一次建構 {int((rebuilt.dtypes == object).sum())} / 逐欄插入 {int((legacy.dtypes == object).sum())}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
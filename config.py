@@ -17,6 +17,48 @@ class Config:
     IAP_PORT = os.getenv("IAP_PORT", "5432")
     IAP_LOCAL_PORT = os.getenv("IAP_LOCAL_PORT", "5432")
 
+    # Extractor 配置
+    EXTRACT_CONCURRENT = os.getenv("EXTRACT_CONCURRENT", "true").lower() == "true"
+    EXTRACT_MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", "6"))
+    # 是否依各 Transformer 宣告的欄位只提取需要的欄位
+    EXTRACT_COLUMN_PROJECTION = os.getenv("EXTRACT_COLUMN_PROJECTION", "true").lower() == "true"
+    # 去重方式："distinct" 為整列 SELECT DISTINCT（預設）；"latest" 供應商來源依業務鍵只保留最新爬取的一筆（BigQuery 端 QUALIFY）
+    EXTRACT_DEDUP = os.getenv("EXTRACT_DEDUP", "distinct").lower()
+    # 是否以 BigQuery Storage Read API（Arrow）下載查詢結果
+    EXTRACT_USE_ARROW = os.getenv("EXTRACT_USE_ARROW", "false").lower() == "true"
+    # 分塊提取與清洗的每塊筆數；0 代表一次提取完整結果
+    EXTRACT_CHUNK_ROWS = int(os.getenv("EXTRACT_CHUNK_ROWS", "0"))
+    # 固定快照時間（epoch 秒），用於重現同一個時間窗口；未設定時為執行當下
+    EXTRACT_SNAPSHOT_TS = int(os.getenv("EXTRACT_SNAPSHOT_TS")) if os.getenv("EXTRACT_SNAPSHOT_TS") else None
+    # 增量提取：Cola 只提取水位線之後的資料（供應商仍提取完整時間窗口），寫入時依業務鍵取代並刪除超出時間窗口的資料
+    EXTRACT_INCREMENTAL = os.getenv("EXTRACT_INCREMENTAL", "false").lower() == "true"
+    # 水位線檔案須位於跨執行保留的位置（如 GCS FUSE 或持久化磁碟）；Cloud Run 的本機磁碟每次執行都會清空，因此不提供預設值
+    EXTRACT_WATERMARK_PATH = os.getenv("EXTRACT_WATERMARK_PATH", "")
+    # 本機提取快取（Parquet）；目錄為空字串時停用。重複執行同一窗口需搭配 EXTRACT_SNAPSHOT_TS
+    EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", "")
+    EXTRACT_CACHE_TTL_SECONDS = int(os.getenv("EXTRACT_CACHE_TTL_SECONDS", "86400"))
+    EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+    EXTRACT_CACHE_REFRESH = os.getenv("EXTRACT_CACHE_REFRESH", "false").lower() == "true"
+    # 送出查詢前先 dry run 估算掃描量；任一上限（位元組，0 代表不限制）大於 0 時一律啟用，超過上限即於下載前中止
+    EXTRACT_DRY_RUN = os.getenv("EXTRACT_DRY_RUN", "true").lower() == "true"
+    EXTRACT_MAX_BYTES_PER_QUERY = int(os.getenv("EXTRACT_MAX_BYTES_PER_QUERY", "0"))
+    EXTRACT_MAX_BYTES_PER_RUN = int(os.getenv("EXTRACT_MAX_BYTES_PER_RUN", "0"))
+    # 提取來源："bigquery" 連線 BigQuery；"files" 由 EXTRACT_SNAPSHOT_DIR 內的 Parquet/CSV 快照離線重播
+    EXTRACT_BACKEND = os.getenv("EXTRACT_BACKEND", "bigquery")
+    EXTRACT_SNAPSHOT_DIR = os.getenv("EXTRACT_SNAPSHOT_DIR", "snapshots")
+    # join 前供應商資料的縮減方式："none" 不縮減（預設）、"latest" 每個 join 鍵保留最新爬取者、"min_price" 保留最低票價者
+    SUPPLIER_REDUCTION = os.getenv("SUPPLIER_REDUCTION", "none").lower()
+    # 寫入方式："insert" 為參數化 INSERT（預設）；"copy" 以 COPY ... FROM STDIN 串流寫入（psycopg2 與 pg8000 皆支援）
+    LOAD_METHOD = os.getenv("LOAD_METHOD", "insert").lower()
+    # 分批寫入：初始每批筆數（0 代表一次寫入）與每批目標耗時（秒），批次大小依實際吞吐量自動調整
+    LOAD_BATCH_ROWS = int(os.getenv("LOAD_BATCH_ROWS", "50000"))
+    LOAD_BATCH_TARGET_SECONDS = float(os.getenv("LOAD_BATCH_TARGET_SECONDS", "2"))
+    # 全量寫入方式："truncate" 備份後清空正式表再寫入（預設）；"swap" 寫入新表後改名切換（零停機，上一版保留為回滾用）；
+    # "differential" 依業務鍵比對資料指紋，只寫入新增、變更與刪除的資料列
+    LOAD_MODE = os.getenv("LOAD_MODE", "truncate").lower()
+    # 並行寫入的連線數：大於 1 時依業務鍵（航班、艙等、去回程日期）雜湊分區，以多條連線同時寫入 UNLOGGED 暫存表後一次搬入
+    LOAD_PARALLELISM = int(os.getenv("LOAD_PARALLELISM", "1"))
+
     @staticmethod
     def setup_iap_tunnel():
         """設置 IAP tunnel 連接"""
@@ -0,0 +1,199 @@
+# 標準庫
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Iterator, Optional
+
+# 外部庫
+from pandas import DataFrame
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Parquet schema metadata 鍵：記錄原本為 `string[pyarrow]` 的欄位，讀回時還原（pandas metadata 不保留字串儲存方式）
+_ARROW_STRING_COLUMNS_KEY = b'etl.arrow_string_columns'
+
+class ExtractionCache:
+    """
+    ExtractionCache 類別將查詢結果以 Parquet 檔快取於本機，供重複執行同一時間窗口時免去 BigQuery 查詢與下載。
+
+    快取鍵為正規化後查詢字串（含時間窗口條件）的 SHA-256；過期（TTL）或超出容量上限時刪除最久未使用的檔案。
+
+    屬性:
+        directory (str): 快取目錄。
+        ttl_seconds (int): 快取有效秒數。
+        max_bytes (int): 快取目錄容量上限。
+        refresh (bool): 為 True 時忽略既有快取（仍會寫入新結果），用於強制重新提取。
+
+    方法:
+        get(query: str) -> Optional[DataFrame]: 取得快取結果。
+        iter_batches(query: str, chunk_rows: int) -> Optional[Iterator[DataFrame]]: 逐塊讀取快取結果。
+        put(query: str, dataframe: DataFrame): 寫入快取並執行容量淘汰。
+    """
+    def __init__(self, directory: str, ttl_seconds: int = 86400, max_bytes: int = 5 * 1024 ** 3, refresh: bool = False):
+        """
+        初始化 ExtractionCache 物件。
+
+        參數:
+            directory (str): 快取目錄，不存在時自動建立。
+            ttl_seconds (int): 快取有效秒數，預設一天。
+            max_bytes (int): 快取目錄容量上限，預設 5 GiB。
+            refresh (bool): 是否忽略既有快取。
+        """
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(query: str) -> str:
+        """
+        計算查詢字串的快取鍵：合併多餘空白後取 SHA-256。
+
+        參數:
+            query (str): SQL 查詢字串。
+
+        返回:
+            str: 十六進位雜湊字串。
+        """
+        normalized = re.sub(r"\s+", " ", query).strip()
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def get(self, query: str) -> Optional[DataFrame]:
+        """
+        取得查詢的快取結果。
+
+        參數:
+            query (str): SQL 查詢字串。
+
+        返回:
+            Optional[DataFrame]: 快取命中時為查詢結果，否則為 None。
+        """
+        path = self._lookup(query)
+        if path is None:
+            return None
+        table = pq.read_table(path, memory_map=True)
+        arrow_string_columns = self._arrow_string_columns(table.schema)
+        return self._restore_string_dtypes(table.to_pandas(split_blocks=True, self_destruct=True), arrow_string_columns)
+
+    def iter_batches(self, query: str, chunk_rows: int) -> Optional[Iterator[DataFrame]]:
+        """
+        逐塊讀取查詢的快取結果，每塊最多 `chunk_rows` 筆。
+
+        參數:
+            query (str): SQL 查詢字串。
+            chunk_rows (int): 每塊最多筆數。
+
+        返回:
+            Optional[Iterator[DataFrame]]: 快取命中時為分塊迭代器，否則為 None。
+        """
+        path = self._lookup(query)
+        if path is None:
+            return None
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        arrow_string_columns = self._arrow_string_columns(parquet_file.schema_arrow)
+        return (
+            self._restore_string_dtypes(batch.to_pandas(), arrow_string_columns)
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows)
+        )
+
+    def put(self, query: str, dataframe: DataFrame):
+        """
+        將查詢結果寫入快取；無法以 Parquet 表示的資料（如混合型別欄位）僅記錄警告並略過。
+
+        參數:
+            query (str): SQL 查詢字串。
+            dataframe (DataFrame): 查詢結果。
+        """
+        path = self._path(query)
+        tmp_path = f"{path}.tmp"
+        try:
+            table = pa.Table.from_pandas(dataframe, preserve_index=False)
+            arrow_string_columns = [
+                column for column, dtype in dataframe.dtypes.items()
+                if isinstance(dtype, pd.StringDtype) and dtype.storage == 'pyarrow'
+            ]
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                _ARROW_STRING_COLUMNS_KEY: json.dumps(arrow_string_columns).encode('utf-8'),
+            })
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            self.logger.warning("無法寫入提取快取，略過：%s", e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+
+    @staticmethod
+    def _arrow_string_columns(schema: pa.Schema) -> list:
+        """
+        讀取寫入前為 `string[pyarrow]` 的欄位清單。
+        """
+        return json.loads((schema.metadata or {}).get(_ARROW_STRING_COLUMNS_KEY, b'[]'))
+
+    @staticmethod
+    def _restore_string_dtypes(dataframe: DataFrame, arrow_string_columns: list) -> DataFrame:
+        """
+        將寫入前為 `string[pyarrow]` 的欄位還原為相同 dtype，使快取結果與直接下載的型別一致。
+        """
+        for column in arrow_string_columns:
+            dataframe[column] = dataframe[column].astype(pd.StringDtype(storage='pyarrow'))
+        return dataframe
+
+    def _path(self, query: str) -> str:
+        """
+        取得查詢對應的快取檔案路徑。
+        """
+        return os.path.join(self.directory, f"{self.fingerprint(query)}.parquet")
+
+    def _lookup(self, query: str) -> Optional[str]:
+        """
+        查找有效的快取檔案；過期者刪除。命中時更新存取時間作為淘汰依據。
+
+        返回:
+            Optional[str]: 快取檔案路徑，未命中時為 None。
+        """
+        if self.refresh:
+            return None
+        path = self._path(query)
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        if time.time() - stat.st_mtime > self.ttl_seconds:
+            self.logger.info("提取快取已過期，刪除：%s", path)
+            os.remove(path)
+            return None
+        # 以 atime 記錄最近使用時間，mtime 保留寫入時間供 TTL 判斷
+        os.utime(path, (time.time(), stat.st_mtime))
+        self.logger.info("提取快取命中：%s", path)
+        return path
+
+    def _evict(self):
+        """
+        刪除過期檔案，並在總容量超過上限時依最久未使用的順序刪除檔案。
+        """
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.parquet'):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            if now - stat.st_mtime > self.ttl_seconds:
+                os.remove(path)
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.logger.info("提取快取超出容量上限，刪除：%s", path)
+            os.remove(path)
+            total -= size
@@ -1,50 +1,228 @@
 # 標準庫
-from datetime import datetime, timedelta
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
 
 # 外部庫
 from google.cloud import bigquery
 from pandas import DataFrame
+import pandas as pd
+import pyarrow as pa
 
-def get_midnight_timestamp():
+# 本地庫
+from etl.cache import ExtractionCache
+from etl.watermark import WatermarkStore
+
+try:
+    from google.cloud import bigquery_storage
+except ImportError:  # 未安裝時串流提取改走 REST 分頁
+    bigquery_storage = None
+
+def _sql_literal(value) -> str:
+    """
+    將 Python 值轉為 BigQuery SQL 常值。
+
+    參數:
+        value: 布林、數值或字串。
+
+    返回:
+        str: SQL 常值字串，例如 TRUE、123、'abc'。
     """
-    計算前12小時的時間戳。
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+def _arrow_types_mapper(arrow_type):
+    """
+    Arrow 轉 pandas 時的型別對應：字串欄位保留為 Arrow 支援的 `string[pyarrow]`，其餘使用預設轉換。
+
+    參數:
+        arrow_type (pa.DataType): Arrow 欄位型別。
 
     返回:
-        int: 前12小時的時間戳。
+        Optional[ExtensionDtype]: 對應的 pandas dtype；None 代表使用預設轉換。
+    """
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype(storage='pyarrow')
+    return None
+
+# 預設時間窗口長度（小時）
+WINDOW_HOURS = 12
+
+# 供應商價格的業務鍵：去回程日期，以及去回程各三段的航班編號與艙等。
+SUPPLIER_KEY_COLUMNS = [
+    '去程日期', '回程日期',
+    *[f'{leg}{field}{i}' for leg in ('去程', '回程') for i in range(1, 4) for field in ('航班編號', '艙等')],
+]
+
+# 去重方式："latest" 依 `dedup_keys` 於 BigQuery 端只保留每個業務鍵最新的一筆；"distinct" 為整列 SELECT DISTINCT
+DEDUP_MODES = ('latest', 'distinct')
+
+# 各來源的查詢規格：來源名稱 -> BigQuery 資料表、篩選條件與時間欄位。
+# 查詢時會再加上 `time_expr` 介於時間窗口（或水位線）與本次快照時間之間的條件；
+# `time_column` 為下載後用來計算水位線的欄位名稱；
+# `dedup_keys` 為業務鍵，同鍵多筆時只保留 `time_expr` 最新者（未設定的來源維持整列 DISTINCT）；
+# `incremental` 為增量提取時依水位線只提取新資料的來源。只有 join 的主表（Cola）使用水位線：
+# 供應商來源一律提取完整時間窗口，新的 Cola 資料才能對到先前執行已爬取的供應商價格。
+SOURCES = {
+    'cola': {
+        'table': 'New_cola_air_tickets_price',
+        'where': "`總售價` IS NOT NULL",
+        'time_column': '建立時間',
+        'time_expr': "`建立時間`",
+        'incremental': True,
+    },
+    'set': {
+        'table': 'New_settour_air_tickets_price',
+        'where': "`票面價格` IS NOT NULL",
+        'time_column': 'crawl_time',
+        'time_expr': "CAST(crawl_time AS INT64)",
+        'dedup_keys': SUPPLIER_KEY_COLUMNS,
+    },
+    'lion': {
+        'table': 'New_Lion_air_tickets_price',
+        'where': "`票面價格` IS NOT NULL",
+        'time_column': 'crawl_time',
+        'time_expr': "CAST(crawl_time AS INT64)",
+        'dedup_keys': SUPPLIER_KEY_COLUMNS,
+    },
+    # 易遊網國內與海外供應商來自同一張表，僅以 `海外供應商` 區分；
+    # 帶有 `split` 的來源會與同表同條件的其他來源共用一次掃描，再於記憶體中拆分。
+    # 假設 `海外供應商` = FALSE 代表非海外供應商
+    'eztravel': {
+        'table': 'New_Eztravel_air_tickets_price',
+        'where': "`票面價格` IS NOT NULL",
+        'time_column': 'crawl_time',
+        'time_expr': "CAST(crawl_time AS INT64)",
+        'dedup_keys': SUPPLIER_KEY_COLUMNS,
+        'split': ('海外供應商', False),
+    },
+    # 假設 `海外供應商` = TRUE 代表海外供應商
+    'foreign_supplier_eztravel': {
+        'table': 'New_Eztravel_air_tickets_price',
+        'where': "`票面價格` IS NOT NULL",
+        'time_column': 'crawl_time',
+        'time_expr': "CAST(crawl_time AS INT64)",
+        'dedup_keys': SUPPLIER_KEY_COLUMNS,
+        'split': ('海外供應商', True),
+    },
+    'rich': {
+        'table': 'New_richmond_air_tickets_price',
+        'where': "`票面價格` IS NOT NULL",
+        'time_column': 'crawl_time',
+        'time_expr': "CAST(crawl_time AS INT64)",
+        'dedup_keys': SUPPLIER_KEY_COLUMNS,
+    },
+}
+
+def _scan_key(spec: dict) -> tuple:
     """
-    now = datetime.now()
-    yesterday = now - timedelta(hours=12)
-    return int(yesterday.timestamp())
+    可共用掃描的判斷依據：同一張表、相同的篩選條件與時間欄位。
+    """
+    return (spec['table'], spec['where'], spec['time_expr'])
 
 class Extractor:
     """
     Extractor類用於從Google BigQuery中提取資料。
 
     屬性:
-        client (bigquery.Client): 用於與BigQuery進行互動的客戶端物件。
+        client (bigquery.Client): 用於與BigQuery進行互動的客戶端物件（離線時為 `FakeBigQueryClient`）。
+        max_workers (int): 並行下載查詢結果時的最大執行緒數。
+        projections (Dict[str, List[str]]): 各來源需要的原始欄位；未列出的來源提取全部欄位。
+        dedup (str): 去重方式，見 `DEDUP_MODES`。
+        use_arrow (bool): 是否以 BigQuery Storage Read API 取得 Arrow 結果再轉為 pandas。
+        metrics (Dict[str, dict]): 各次掃描最近一次提取的計時、筆數與掃描位元組（預估、實際處理、計費）。
+        snapshot_timestamp (int): 本次執行的快照時間，所有來源共用同一個上界。
+        window_start (int): 預設時間窗口起點（快照時間往前 `WINDOW_HOURS` 小時）。
+        watermark_store (WatermarkStore): 增量提取時保存各來源水位線的儲存。
+        observed_watermarks (Dict[str, float]): 本次提取各來源所見的最大時間值。
+        cache (ExtractionCache): 查詢結果的本機快取；None 代表不使用快取。
+        dry_run (bool): 送出查詢前是否先以 dry run 估算掃描量。
+        max_bytes_per_query (int): 單一查詢的預估掃描量上限（位元組），0 代表不限制。
+        max_bytes_per_run (int): 單次執行所有查詢的預估掃描量合計上限（位元組），0 代表不限制。
+        run_metrics (dict): 最近一次 `extract_all` 的彙總：總耗時、掃描次數、預估與實際計費位元組。
 
     方法:
-        __init__(project_id: str): 初始化Extractor物件並設置BigQuery客戶端。
+        __init__(project_id: str, max_workers: int): 初始化Extractor物件並設置BigQuery客戶端。
         fetch_data_as_dataframe(query: str) -> pd.DataFrame: 執行SQL查詢並返回結果為pandas DataFrame。
-        save_to_csv(dataframe: pd.DataFrame, file_path: str): 將DataFrame保存為CSV文件。
+        build_query(source: str) -> str: 依來源規格組出查詢字串。
+        build_select_list(sources: List[str]) -> str: 依各來源宣告的欄位組出 SELECT 欄位清單。
+        build_shared_query(sources: List[str]) -> str: 組出同表多來源共用的單次掃描查詢。
+        split_shared_scan(dataframe, sources) -> Dict[str, DataFrame]: 將共用掃描結果依條件拆分為各來源。
+        extract_all(sources, max_workers) -> Dict[str, DataFrame]: 並行提取多個來源的資料。
+        commit_watermarks(): 將本次所見的水位線寫回儲存（應於資料成功寫入後呼叫）。
+        iter_dataframes(query: str, chunk_rows: int) -> Iterator[DataFrame]: 以固定筆數上限逐塊提取查詢結果。
+        iter_scan(sources, chunk_rows) -> Iterator[Dict[str, DataFrame]]: 逐塊提取一次掃描並拆分為各來源。
+        estimate_query(query: str) -> dict: 以 dry run 估算查詢的掃描位元組數與是否命中 BigQuery 快取。
     """
-    def __init__(self, project_id: str):
+    def __init__(self, project_id: str, max_workers: int = len(SOURCES), projections: Optional[Dict[str, List[str]]] = None,
+                 use_arrow: bool = False, snapshot_timestamp: Optional[int] = None,
+                 watermark_store: Optional[WatermarkStore] = None, cache: Optional[ExtractionCache] = None,
+                 client=None, dedup: str = 'distinct', dry_run: bool = False,
+                 max_bytes_per_query: int = 0, max_bytes_per_run: int = 0):
         """
         初始化Extractor物件。
 
         參數:
             project_id (str): Google Cloud專案ID，用於初始化BigQuery客戶端。
+            max_workers (int): 並行下載查詢結果時的最大執行緒數，預設為來源數量。
+            projections (Dict[str, List[str]]): 來源名稱對應需要的原始欄位（通常取自各 Transformer 的 `source_columns`）；
+                None 或未列出的來源維持 `SELECT *`。
+            use_arrow (bool): 是否啟用 Arrow 快速路徑（見 `_to_dataframe`），預設關閉。
+            snapshot_timestamp (int): 本次執行的快照時間（epoch 秒），None 代表現在；指定固定值可重現同一個時間窗口。
+            watermark_store (WatermarkStore): 提供時啟用增量提取，`incremental` 來源只提取水位線之後的資料；
+                其他來源與尚無水位線的來源仍使用預設時間窗口。
+            cache (ExtractionCache): 提供時先查本機快取，命中則不送出 BigQuery 查詢；
+                快取鍵包含時間窗口，需固定 `snapshot_timestamp` 才能在重複執行時命中。
+            client: 取代 `bigquery.Client` 的客戶端（如 `FakeBigQueryClient`），None 代表連線 BigQuery。
+            dedup (str): 'latest' 時帶有 `dedup_keys` 的來源以 QUALIFY 只保留各業務鍵最新的一筆；
+                'distinct'（預設）時所有來源皆為整列 SELECT DISTINCT。
+            dry_run (bool): 是否於送出每個查詢前先 dry run（不計費），記錄預估掃描量並檢查預算；
+                設定任一預算上限時一律啟用。
+            max_bytes_per_query (int): 單一查詢的預估掃描量上限（位元組），超過時於下載前拋出 RuntimeError；0 代表不限制。
+            max_bytes_per_run (int): 單次執行（一次 `extract_all`，或本物件逐一提取的累計）預估掃描量上限，0 代表不限制。
         """
-        self.client = bigquery.Client(project=project_id)
+        if max_workers < 1:
+            raise ValueError("max_workers 必須大於 0")
+        if max_bytes_per_query < 0 or max_bytes_per_run < 0:
+            raise ValueError("掃描量上限不可為負數")
+        if dedup not in DEDUP_MODES:
+            raise ValueError(f"未知的去重方式：{dedup}，可用值為 {DEDUP_MODES}")
+        self.client = client if client is not None else bigquery.Client(project=project_id)
         self.project_id = project_id
-        print(f"new_timestamp: {get_midnight_timestamp()}")
+        self.max_workers = max_workers
+        self.use_arrow = use_arrow
+        self.dedup = dedup
+        self.snapshot_timestamp = int(snapshot_timestamp if snapshot_timestamp is not None else time.time())
+        self.window_start = self.snapshot_timestamp - WINDOW_HOURS * 3600
+        self.watermark_store = watermark_store
+        self.observed_watermarks = {}
+        self.cache = cache
+        self.dry_run = dry_run or bool(max_bytes_per_query or max_bytes_per_run)
+        self.max_bytes_per_query = max_bytes_per_query
+        self.max_bytes_per_run = max_bytes_per_run
+        # 本次執行已通過預算檢查的預估掃描量合計
+        self._estimated_bytes = 0
+        self.run_metrics = {}
+        self.projections = {source: columns for source, columns in (projections or {}).items() if columns is not None}
+        self.metrics = {}
+        # 資料表欄位快取，避免重複查詢 schema
+        self._table_columns = {}
+        # 共用掃描時，尚未被取走的其他來源結果
+        self._shared_frames = {}
+        self.logger = logging.getLogger(__name__)
+        self.logger.debug(f"提取時間窗口起點：{self.window_start}")
 
-    def fetch_data_as_dataframe(self, query: str) -> DataFrame:
+    def fetch_data_as_dataframe(self, query: str, label: Optional[str] = None) -> DataFrame:
         """
         執行SQL查詢並將結果轉換為pandas DataFrame。
 
         參數:
             query (str): 要執行的SQL查詢字串。
+            label (str): 記錄於 `metrics` 的名稱（通常為來源名稱）；None 代表不記錄。
 
         返回:
             pd.DataFrame: 查詢結果的DataFrame表示。
@@ -53,8 +231,582 @@ class Extractor:
         if not isinstance(query, str):
             raise TypeError("Query must be a string")
 
+        if self.cache is not None:
+            cached = self.cache.get(query)
+            if cached is not None:
+                return cached
+
+        self._check_budget(label, query)
         query_job = self.client.query(query)
-        dataframe = query_job.to_dataframe()
+        dataframe = self._to_dataframe(query_job)
+        self._record_job(label, query_job)
+        if self.cache is not None:
+            self.cache.put(query, dataframe)
+        return dataframe
+
+    def _to_dataframe(self, query_job) -> DataFrame:
+        """
+        將查詢結果下載為 DataFrame。
+
+        作法：
+        - 啟用 `use_arrow` 時，透過 BigQuery Storage Read API 以多條串流並行讀取 Arrow record batch，
+          字串欄位轉為 `string[pyarrow]`，不逐格建立 Python 物件。
+        - 未安裝 `google-cloud-bigquery-storage` 時 `to_arrow` 會自動改走 REST 分頁；
+          其他錯誤（如權限不足）則記錄警告並退回 `to_dataframe()`。
+
+        參數:
+            query_job: 已送出的 BigQuery 查詢工作。
+
+        返回:
+            DataFrame: 查詢結果。
+        """
+        if self.use_arrow:
+            try:
+                arrow_table = query_job.to_arrow(create_bqstorage_client=True)
+            except Exception as e:
+                self.logger.warning("Arrow 快速路徑失敗，改用一般下載：%s", e)
+            else:
+                return arrow_table.to_pandas(types_mapper=_arrow_types_mapper, split_blocks=True, self_destruct=True)
+        return query_job.to_dataframe()
+
+    def iter_dataframes(self, query: str, chunk_rows: int, label: Optional[str] = None) -> Iterator[DataFrame]:
+        """
+        執行SQL查詢並以固定筆數上限逐塊產出結果，避免一次將整個結果集載入記憶體。
+
+        作法：
+        - 啟用 `use_arrow` 且已安裝 BigQuery Storage 時，逐一讀取 Arrow record batch；否則以 `chunk_rows` 為頁大小讀取 REST 分頁。
+        - 將來源分塊重新切分／合併為每塊最多 `chunk_rows` 筆。
+        - 結果為空時仍產出一個僅含欄位的空 DataFrame，方便下游沿用相同流程。
+        - 快取命中時直接逐塊讀取快取檔；分塊提取不寫入快取（避免為寫檔而保留整個結果集）。
+
+        參數:
+            query (str): 要執行的SQL查詢字串。
+            chunk_rows (int): 每塊最多筆數。
+            label (str): 記錄於 `metrics` 的名稱；None 代表不記錄。
+
+        返回:
+            Iterator[DataFrame]: 逐塊的查詢結果（索引自 0 重新編號）。
+        """
+        if not isinstance(query, str):
+            raise TypeError("Query must be a string")
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows 必須大於 0")
+
+        if self.cache is not None:
+            cached_batches = self.cache.iter_batches(query, chunk_rows)
+            if cached_batches is not None:
+                yield from self._rebatch(cached_batches, chunk_rows)
+                return
+
+        self._check_budget(label, query)
+        query_job = self.client.query(query)
+        rows = query_job.result(page_size=chunk_rows)
+        self._record_job(label, query_job)
+        if self.use_arrow:
+            # 只有真正的 BigQuery 連線才建立 Storage API 用戶端；離線重播（FakeBigQueryClient）不需要連線與憑證
+            if bigquery_storage is not None and isinstance(self.client, bigquery.Client):
+                batches = rows.to_arrow_iterable(bqstorage_client=bigquery_storage.BigQueryReadClient())
+            else:
+                batches = rows.to_arrow_iterable()
+            frames = (
+                batch.to_pandas(types_mapper=_arrow_types_mapper, split_blocks=True, self_destruct=True)
+                for batch in (pa.Table.from_batches([record_batch]) for record_batch in batches)
+            )
+        else:
+            frames = rows.to_dataframe_iterable()
+
+        yielded = False
+        for chunk in self._rebatch(frames, chunk_rows):
+            yielded = True
+            yield chunk
+        if not yielded:
+            yield DataFrame(columns=[field.name for field in rows.schema])
+
+    def iter_scan(self, sources: List[str], chunk_rows: int) -> Iterator[Dict[str, DataFrame]]:
+        """
+        逐塊提取一次掃描（見 `plan_scans`），並將每塊拆分為其涵蓋的各來源。
+
+        參數:
+            sources (List[str]): 此次掃描涵蓋的來源名稱。
+            chunk_rows (int): 每塊最多筆數。
+
+        返回:
+            Iterator[Dict[str, DataFrame]]: 每塊對應的「來源名稱 -> DataFrame」。
+        """
+        for chunk in self.iter_dataframes(self._build_scan_query(sources), chunk_rows, label='+'.join(sources)):
+            frames = {sources[0]: chunk} if len(sources) == 1 else self.split_shared_scan(chunk, sources)
+            for source, frame in frames.items():
+                self._observe(source, frame)
+            yield frames
+
+    def estimate_query(self, query: str) -> dict:
+        """
+        以 dry run 估算查詢成本（不執行查詢、不計費）。
+
+        參數:
+            query (str): 要估算的SQL查詢字串。
+
+        返回:
+            dict: `estimated_bytes`（預估掃描位元組數）與 `bq_cache_hit`（是否會命中 BigQuery 查詢快取；無法判斷時為 None）。
+        """
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=True)
+        dry_run_job = self.client.query(query, job_config=job_config)
+        return {
+            'estimated_bytes': int(dry_run_job.total_bytes_processed or 0),
+            'bq_cache_hit': getattr(dry_run_job, 'cache_hit', None),
+        }
+
+    def reset_budget(self):
+        """
+        將單次執行的累計預估掃描量歸零（`extract_all` 開始時自動呼叫）。
+        """
+        self._estimated_bytes = 0
+
+    def _check_budget(self, label: Optional[str], query: str) -> Optional[dict]:
+        """
+        依設定先 dry run 查詢，記錄預估成本並檢查單一查詢與單次執行的掃描量上限。
+
+        參數:
+            label (str): 記錄於 `metrics` 的名稱；None 代表不記錄。
+            query (str): 要檢查的SQL查詢字串。
+
+        返回:
+            dict: `estimate_query` 的結果；未啟用 dry run 時為 None。
+
+        例外:
+            RuntimeError: 預估掃描量超過上限時拋出，查詢不會被送出。
+        """
+        if not self.dry_run:
+            return None
+        estimate = self.estimate_query(query)
+        estimated_bytes = estimate['estimated_bytes']
+        if label is not None:
+            self.metrics.setdefault(label, {}).update(estimate)
+        self.logger.info(
+            "查詢 %s 預估掃描 %.1f MiB（BigQuery 快取命中：%s）",
+            label or '(未命名)', estimated_bytes / 1024 ** 2, estimate['bq_cache_hit'],
+        )
+        if self.max_bytes_per_query and estimated_bytes > self.max_bytes_per_query:
+            raise RuntimeError(
+                f"查詢 {label or ''} 預估掃描 {estimated_bytes} 位元組，超過單一查詢上限 {self.max_bytes_per_query}"
+            )
+        if self.max_bytes_per_run and self._estimated_bytes + estimated_bytes > self.max_bytes_per_run:
+            raise RuntimeError(
+                f"本次執行預估掃描 {self._estimated_bytes + estimated_bytes} 位元組，超過單次執行上限 {self.max_bytes_per_run}"
+            )
+        self._estimated_bytes += estimated_bytes
+        return estimate
+
+    def _record_job(self, label: Optional[str], query_job):
+        """
+        將查詢工作實際處理與計費的位元組數記錄於 `metrics`。
+        """
+        if label is None:
+            return
+        self.metrics.setdefault(label, {}).update({
+            'bytes_processed': getattr(query_job, 'total_bytes_processed', None),
+            'bytes_billed': getattr(query_job, 'total_bytes_billed', None),
+            'bq_cache_hit': getattr(query_job, 'cache_hit', None),
+        })
+
+    @staticmethod
+    def _rebatch(frames: Iterable[DataFrame], chunk_rows: int) -> Iterator[DataFrame]:
+        """
+        將任意大小的 DataFrame 串流重新切分為每塊最多 `chunk_rows` 筆。
+
+        參數:
+            frames (Iterable[DataFrame]): 來源分塊。
+            chunk_rows (int): 每塊最多筆數。
+
+        返回:
+            Iterator[DataFrame]: 重新切分後的分塊。
+        """
+        pending = []
+        pending_rows = 0
+        for frame in frames:
+            start = 0
+            while start < len(frame):
+                piece = frame.iloc[start:start + chunk_rows - pending_rows]
+                start += len(piece)
+                pending.append(piece)
+                pending_rows += len(piece)
+                if pending_rows == chunk_rows:
+                    yield pd.concat(pending, ignore_index=True)
+                    pending = []
+                    pending_rows = 0
+        if pending:
+            yield pd.concat(pending, ignore_index=True)
+
+    def build_query(self, source: str) -> str:
+        """
+        依 `SOURCES` 中的來源規格組出查詢字串。
+
+        參數:
+            source (str): 來源名稱，如 'cola'、'set'。
+
+        返回:
+            str: 可直接送至 BigQuery 的 SQL 字串。
+        """
+        if source not in SOURCES:
+            raise ValueError(f"未知的資料來源：{source}")
+        spec = SOURCES[source]
+        where = self._build_where([source])
+        if 'split' in spec:
+            column, value = spec['split']
+            where = f"{where} AND `{column}` = {_sql_literal(value)}"
+        distinct, qualify = self._build_dedup([source])
+        return f"SELECT {distinct}{self.build_select_list([source])} FROM `{self.project_id}.economy.{spec['table']}` WHERE {where}{qualify}"
+
+    def build_shared_query(self, sources: List[str]) -> str:
+        """
+        組出多個同表來源共用的單次掃描查詢。
+
+        各來源的拆分條件以 OR 合併（同欄位時寫成 IN），確保結果恰為各來源的聯集。
+
+        參數:
+            sources (List[str]): 來源名稱，必須屬於同一張表且基礎條件相同。
+
+        返回:
+            str: 可直接送至 BigQuery 的 SQL 字串。
+        """
+        specs = [SOURCES[source] for source in sources]
+        if len({_scan_key(spec) for spec in specs}) != 1 or not all('split' in spec for spec in specs):
+            raise ValueError(f"來源無法共用掃描：{sources}")
+        values_by_column = {}
+        for spec in specs:
+            column, value = spec['split']
+            values_by_column.setdefault(column, []).append(_sql_literal(value))
+        split_predicate = ' OR '.join(
+            f"`{column}` IN ({', '.join(values)})" for column, values in values_by_column.items()
+        )
+        where = self._build_where(sources)
+        distinct, qualify = self._build_dedup(sources)
+        return (f"SELECT {distinct}{self.build_select_list(sources)} FROM `{self.project_id}.economy.{specs[0]['table']}` "
+                f"WHERE {where} AND ({split_predicate}){qualify}")
+
+    def lower_bound(self, source: str) -> float:
+        """
+        取得來源本次提取的時間下界（不含）。
+
+        增量提取、來源使用水位線（`incremental`）且已有水位線時為該水位線，否則為預設時間窗口起點。
+
+        參數:
+            source (str): 來源名稱。
+
+        返回:
+            float: epoch 秒。
+        """
+        if self.watermark_store is not None and SOURCES[source].get('incremental'):
+            watermark = self.watermark_store.get(source)
+            if watermark is not None:
+                return watermark
+        return self.window_start
+
+    def commit_watermarks(self):
+        """
+        將本次提取各來源所見的最大時間值寫回水位線儲存。
+
+        應於資料成功寫入目標後才呼叫，避免寫入失敗時跳過尚未處理的資料。
+        未啟用增量提取時不做任何事。
+        """
+        if self.watermark_store is None or not self.observed_watermarks:
+            return
+        self.watermark_store.update(self.observed_watermarks)
+        self.logger.info("已更新水位線：%s", self.observed_watermarks)
+
+    def _observe(self, source: str, dataframe: DataFrame) -> DataFrame:
+        """
+        記錄來源本次所見的最大時間值（分塊提取時取各塊的最大值）；只記錄使用水位線的來源。
+
+        參數:
+            source (str): 來源名稱。
+            dataframe (DataFrame): 該來源提取到的資料（或其中一塊）。
+
+        返回:
+            DataFrame: 原樣返回 `dataframe`，方便串接。
+        """
+        time_column = SOURCES[source]['time_column']
+        if SOURCES[source].get('incremental') and time_column in dataframe.columns and not dataframe.empty:
+            latest = pd.to_numeric(dataframe[time_column], errors='coerce').max()
+            if pd.notna(latest):
+                # 保留小數（`建立時間` 可能為浮點 epoch 秒），避免下次重複提取同一秒內的資料
+                latest = int(latest) if float(latest).is_integer() else float(latest)
+                self.observed_watermarks[source] = max(latest, self.observed_watermarks.get(source, latest))
+        return dataframe
+
+    def _build_where(self, sources: List[str]) -> str:
+        """
+        組出掃描的 WHERE 條件：基礎篩選 + 時間介於下界（共用掃描取各來源最小值）與快照時間之間。
+        """
+        spec = SOURCES[sources[0]]
+        since = min(self.lower_bound(source) for source in sources)
+        return (f"{spec['where']} AND {spec['time_expr']} > {since} "
+                f"AND {spec['time_expr']} <= {self.snapshot_timestamp}")
+
+    def _build_dedup(self, sources: List[str]) -> tuple:
+        """
+        組出掃描的去重語法。
+
+        作法：
+        - `dedup` 為 'latest' 且來源設有 `dedup_keys` 時，以
+          `QUALIFY ROW_NUMBER() OVER (PARTITION BY 業務鍵 ORDER BY time_expr DESC) = 1` 只保留各鍵最新的一筆，
+          BigQuery 只需對業務鍵分組，不必雜湊每一列的所有欄位。
+        - 共用掃描另以拆分欄位分組，使各來源各自保留最新的一筆。
+        - 業務鍵與資料表 schema 取交集；其餘情況退回整列 `SELECT DISTINCT`。
+
+        參數:
+            sources (List[str]): 共用此次查詢的來源名稱（須屬於同一張表）。
+
+        返回:
+            tuple: (接在 SELECT 後的 `DISTINCT ` 或空字串, 接在 WHERE 條件後的 QUALIFY 子句或空字串)。
+        """
+        spec = SOURCES[sources[0]]
+        if self.dedup != 'latest' or 'dedup_keys' not in spec:
+            return 'DISTINCT ', ''
+        keys = list(spec['dedup_keys'])
+        if len(sources) > 1:
+            keys.extend(SOURCES[source]['split'][0] for source in sources)
+        available = self._get_table_columns(spec['table'])
+        keys = [column for column in dict.fromkeys(keys) if column in available]
+        if not keys:
+            return 'DISTINCT ', ''
+        partition = ', '.join(f"`{column}`" for column in keys)
+        return '', f" QUALIFY ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY {spec['time_expr']} DESC) = 1"
+
+    def build_select_list(self, sources: List[str]) -> str:
+        """
+        依各來源宣告需要的欄位組出 SELECT 欄位清單。
+
+        作法：
+        - 取各來源於 `projections` 中宣告欄位的聯集，並補上時間欄位（計算水位線用）與拆分條件所需的欄位。
+        - 與資料表實際 schema 取交集；不存在的欄位略過並記錄警告，避免查詢失敗。
+        - 任一來源未宣告欄位、或交集為空時，退回 `*`。
+
+        參數:
+            sources (List[str]): 共用此次查詢的來源名稱（須屬於同一張表）。
+
+        返回:
+            str: 以反引號包覆、逗號分隔的欄位清單，或 `*`。
+        """
+        if not all(source in self.projections for source in sources):
+            return '*'
+        requested = []
+        for source in sources:
+            requested.extend(self.projections[source])
+            requested.append(SOURCES[source]['time_column'])
+            if 'split' in SOURCES[source]:
+                requested.append(SOURCES[source]['split'][0])
+        requested = list(dict.fromkeys(requested))
+
+        table = SOURCES[sources[0]]['table']
+        available = self._get_table_columns(table)
+        missing = [column for column in requested if column not in available]
+        if missing:
+            self.logger.warning("資料表 %s 不存在以下宣告欄位，已略過：%s", table, missing)
+        columns = [column for column in requested if column in available]
+        if not columns:
+            return '*'
+        return ', '.join(f"`{column}`" for column in columns)
+
+    def _get_table_columns(self, table: str) -> set:
+        """
+        取得資料表的欄位名稱集合（僅讀取 metadata，不計費）。
+
+        參數:
+            table (str): `economy` dataset 內的資料表名稱。
+
+        返回:
+            set: 欄位名稱集合。
+        """
+        if table not in self._table_columns:
+            bq_table = self.client.get_table(f"{self.project_id}.economy.{table}")
+            self._table_columns[table] = {field.name for field in bq_table.schema}
+        return self._table_columns[table]
+
+    def split_shared_scan(self, dataframe: DataFrame, sources: List[str]) -> Dict[str, DataFrame]:
+        """
+        將共用掃描的結果依各來源的拆分條件切分為獨立的 DataFrame。
+
+        參數:
+            dataframe (DataFrame): `build_shared_query` 的查詢結果。
+            sources (List[str]): 共用此次掃描的來源名稱。
+
+        返回:
+            Dict[str, DataFrame]: 來源名稱對應的 DataFrame（索引重新編號）。
+        """
+        frames = {}
+        for source in sources:
+            column, value = SOURCES[source]['split']
+            mask = (dataframe[column] == value).fillna(False).astype(bool)
+            if len(sources) > 1 and self.lower_bound(source) > min(self.lower_bound(other) for other in sources):
+                # 共用掃描以各來源最小的下界查詢，水位線較新的來源需再排除已提取過的資料
+                time_column = SOURCES[source]['time_column']
+                mask &= (pd.to_numeric(dataframe[time_column], errors='coerce') > self.lower_bound(source)).fillna(False).astype(bool)
+            frames[source] = dataframe[mask].reset_index(drop=True)
+        return frames
+
+    def plan_scans(self, sources: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        將來源依實體資料表分組，規劃最少的掃描次數。
+
+        帶有 `split` 且資料表與基礎條件相同的來源合併為一次掃描，其餘來源各自掃描。
+
+        參數:
+            sources (Iterable[str]): 要提取的來源名稱。
+
+        返回:
+            Dict[str, List[str]]: 掃描名稱對應其涵蓋的來源；共用掃描名稱以 '+' 串接來源名稱。
+        """
+        groups = {}
+        for source in sources:
+            if source not in SOURCES:
+                raise ValueError(f"未知的資料來源：{source}")
+            spec = SOURCES[source]
+            group_key = _scan_key(spec) if 'split' in spec else source
+            groups.setdefault(group_key, []).append(source)
+        return {'+'.join(group): group for group in groups.values()}
+
+    def _build_scan_query(self, sources: List[str]) -> str:
+        """
+        依掃描涵蓋的來源數量選擇單一來源查詢或共用掃描查詢。
+        """
+        if len(sources) == 1:
+            return self.build_query(sources[0])
+        return self.build_shared_query(sources)
+
+    def _extract_source(self, source: str) -> DataFrame:
+        """
+        提取單一來源的資料；若該來源可與其他來源共用掃描，則一次取回並暫存其他來源的結果。
+
+        參數:
+            source (str): 來源名稱。
+
+        返回:
+            DataFrame: 該來源的資料。
+        """
+        if source in self._shared_frames:
+            return self._shared_frames.pop(source)
+        spec = SOURCES[source]
+        if 'split' not in spec:
+            return self._observe(source, self.fetch_data_as_dataframe(self.build_query(source), label=source))
+        siblings = [
+            name for name, other in SOURCES.items()
+            if 'split' in other and _scan_key(other) == _scan_key(spec)
+        ]
+        frames = self.split_shared_scan(
+            self.fetch_data_as_dataframe(self._build_scan_query(siblings), label='+'.join(siblings)), siblings)
+        for name in siblings:
+            self._observe(name, frames[name])
+            if name != source:
+                self._shared_frames[name] = frames[name]
+        return frames[source]
+
+    def extract_all(self, sources: Optional[Iterable[str]] = None, max_workers: Optional[int] = None) -> Dict[str, DataFrame]:
+        """
+        並行提取多個來源的資料。
+
+        作法：
+        - 依 `plan_scans` 將同表來源合併為一次掃描，再將所有查詢一次送出（BigQuery 端同時執行）；
+          啟用快取且命中的掃描不送出查詢。
+        - 再以有上限的執行緒池並行等待與下載結果。
+        - 共用掃描的結果於記憶體中依條件拆分為各來源。
+        - 啟用 dry run 時，先估算所有掃描的成本並檢查預算，任一超過上限即在送出任何查詢前拋出 RuntimeError。
+        - 每次掃描的等待時間、下載時間、筆數與掃描位元組記錄於 `metrics`，彙總記錄於 `run_metrics`。
+
+        參數:
+            sources (Iterable[str]): 要提取的來源名稱，預設為全部來源。
+            max_workers (int): 並行下載的最大執行緒數，預設沿用初始化設定。
+
+        返回:
+            Dict[str, DataFrame]: 來源名稱對應的 DataFrame。
+        """
+        sources = list(sources) if sources is not None else list(SOURCES)
+        max_workers = max_workers or self.max_workers
+        run_started = time.perf_counter()
+        scans = self.plan_scans(sources)
+        self.reset_budget()
+
+        # 1. 快取命中者直接取用；其餘先 dry run 檢查預算（全部通過才送出任何查詢）
+        queries = {}
+        results = {}
+        for scan, scan_sources in scans.items():
+            query = self._build_scan_query(scan_sources)
+            cached = self.cache.get(query) if self.cache is not None else None
+            if cached is not None:
+                results[scan] = cached
+                self.metrics[scan] = {'query_seconds': 0.0, 'download_seconds': 0.0, 'rows': len(cached), 'cache_hit': True}
+                continue
+            self.metrics[scan] = {}
+            self._check_budget(scan, query)
+            queries[scan] = query
+
+        # 2. 一次送出所有查詢（同表來源共用一次掃描）
+        jobs = {scan: (self.client.query(query), time.perf_counter(), query) for scan, query in queries.items()}
+
+        # 3. 並行下載結果
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)) or 1, thread_name_prefix='extract') as executor:
+            futures = {
+                scan: executor.submit(self._download, scan, job, submitted_at)
+                for scan, (job, submitted_at, _) in jobs.items()
+            }
+            for scan, future in futures.items():
+                results[scan] = future.result()
+                if self.cache is not None:
+                    self.cache.put(jobs[scan][2], results[scan])
+
+        # 4. 共用掃描的結果依條件拆分
+        frames = {}
+        for scan, scan_sources in scans.items():
+            if len(scan_sources) == 1:
+                frames[scan_sources[0]] = results.pop(scan)
+            else:
+                frames.update(self.split_shared_scan(results.pop(scan), scan_sources))
+        for source, frame in frames.items():
+            self._observe(source, frame)
+
+        scan_metrics = [self.metrics[scan] for scan in scans]
+        self.run_metrics = {
+            'seconds': time.perf_counter() - run_started,
+            'scans': len(scans),
+            'queries': len(jobs),
+            'rows': sum(metric.get('rows', 0) for metric in scan_metrics),
+            'estimated_bytes': sum(metric.get('estimated_bytes') or 0 for metric in scan_metrics),
+            'bytes_billed': sum(metric.get('bytes_billed') or 0 for metric in scan_metrics),
+        }
+        self.logger.info(
+            "完成 %d 個來源（%d 次掃描）的並行提取，總耗時 %.2f 秒（max_workers=%d），預估掃描 %.1f MiB，計費 %.1f MiB",
+            len(frames), len(jobs), self.run_metrics['seconds'], max_workers,
+            self.run_metrics['estimated_bytes'] / 1024 ** 2, self.run_metrics['bytes_billed'] / 1024 ** 2,
+        )
+        return frames
+
+    def _download(self, source: str, query_job, submitted_at: float) -> DataFrame:
+        """
+        等待查詢完成並下載結果，同時記錄該次掃描的計時。
+
+        參數:
+            source (str): 掃描名稱（單一來源即為來源名稱）。
+            query_job: 已送出的 BigQuery 查詢工作。
+            submitted_at (float): 查詢送出時的 `time.perf_counter()` 值。
+
+        返回:
+            DataFrame: 查詢結果。
+        """
+        query_job.result()
+        query_done = time.perf_counter()
+        dataframe = self._to_dataframe(query_job)
+        download_done = time.perf_counter()
+        self.metrics.setdefault(source, {}).update({
+            'query_seconds': query_done - submitted_at,
+            'download_seconds': download_done - query_done,
+            'rows': len(dataframe),
+            'cache_hit': False,
+        })
+        self._record_job(source, query_job)
+        self.logger.info(
+            "來源 %s：查詢 %.2f 秒，下載 %.2f 秒，共 %d 筆",
+            source, query_done - submitted_at, download_done - query_done, len(dataframe),
+        )
         return dataframe
 
     def extract_cola_data(self) -> DataFrame:
@@ -64,8 +816,7 @@ class Extractor:
         返回:
             DataFrame: 包含 Cola 表格資料的 DataFrame。
         """
-        query = f"SELECT DISTINCT * FROM `{self.project_id}.economy.New_cola_air_tickets_price` WHERE `總售價` IS NOT NULL AND `建立時間` > {get_midnight_timestamp()}"
-        return self.fetch_data_as_dataframe(query)
+        return self._extract_source('cola')
 
     def extract_set_data(self) -> DataFrame:
         """
@@ -74,8 +825,7 @@ class Extractor:
         返回:
             DataFrame: 包含 Set 表格資料的 DataFrame。
         """
-        query = f"SELECT DISTINCT * FROM `{self.project_id}.economy.New_settour_air_tickets_price` WHERE `票面價格` IS NOT NULL AND CAST(crawl_time AS INT64) > {get_midnight_timestamp()}"
-        return self.fetch_data_as_dataframe(query)
+        return self._extract_source('set')
 
     def extract_lion_data(self) -> DataFrame:
         """
@@ -84,8 +834,7 @@ class Extractor:
         返回:
             DataFrame: 包含 Lion 表格資料的 DataFrame。
         """
-        query = f"SELECT DISTINCT * FROM `{self.project_id}.economy.New_Lion_air_tickets_price` WHERE `票面價格` IS NOT NULL AND CAST(crawl_time AS INT64) > {get_midnight_timestamp()}"
-        return self.fetch_data_as_dataframe(query)
+        return self._extract_source('lion')
 
     def extract_eztravel_data(self) -> DataFrame:
         """
@@ -93,10 +842,11 @@ class Extractor:
 
         返回:
             DataFrame: 包含 Eztravel 表格資料的 DataFrame。
+
+        注意:
+            與海外供應商資料共用同一次掃描，另一半結果會暫存至 `extract_foreign_supplier_eztravel_data` 取用。
         """
-        # 假設 productDesc = FALSE 代表非海外供應商
-        query = f"SELECT DISTINCT * FROM `{self.project_id}.economy.New_Eztravel_air_tickets_price` WHERE `票面價格` IS NOT NULL AND CAST(crawl_time AS INT64) > {get_midnight_timestamp()} AND `海外供應商` = FALSE"
-        return self.fetch_data_as_dataframe(query)
+        return self._extract_source('eztravel')
 
     def extract_foreign_supplier_eztravel_data(self) -> DataFrame:
         """
@@ -104,10 +854,11 @@ class Extractor:
 
         返回:
             DataFrame: 包含海外供應商 Eztravel 表格資料的 DataFrame。
+
+        注意:
+            與非海外供應商資料共用同一次掃描，另一半結果會暫存至 `extract_eztravel_data` 取用。
         """
-        # 假設 productDesc = TRUE 代表海外供應商
-        query = f"SELECT DISTINCT * FROM `{self.project_id}.economy.New_Eztravel_air_tickets_price` WHERE `票面價格` IS NOT NULL AND CAST(crawl_time AS INT64) > {get_midnight_timestamp()} AND `海外供應商` = TRUE"
-        return self.fetch_data_as_dataframe(query)
+        return self._extract_source('foreign_supplier_eztravel')
     
         
     def extract_rich_data(self) -> DataFrame:
@@ -117,5 +868,4 @@ class Extractor:
         返回:
             DataFrame: 包含 Rich 表格資料的 DataFrame。
         """
-        query = f"SELECT DISTINCT * FROM `{self.project_id}.economy.New_richmond_air_tickets_price` WHERE `票面價格` IS NOT NULL AND CAST(crawl_time AS INT64) > {get_midnight_timestamp()}"
-        return self.fetch_data_as_dataframe(query)
\ No newline at end of file
+        return self._extract_source('rich')
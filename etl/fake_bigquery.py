@@ -0,0 +1,309 @@
+# 標準庫
+import logging
+import os
+import re
+import threading
+from typing import Iterator, List, Optional
+
+# 外部庫
+from pandas import DataFrame
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+class FakeSchemaField:
+    """
+    模擬 `bigquery.SchemaField`，僅提供欄位名稱。
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+class FakeTable:
+    """
+    模擬 `bigquery.Table`，僅提供 schema。
+    """
+    def __init__(self, schema: List[FakeSchemaField]):
+        self.schema = schema
+
+class FakeRowIterator:
+    """
+    模擬 `bigquery.table.RowIterator`，以固定頁大小逐頁產出查詢結果。
+    """
+    def __init__(self, table: pa.Table, page_size: Optional[int] = None):
+        self._table = table
+        self._page_size = page_size or max(table.num_rows, 1)
+        self.schema = [FakeSchemaField(name) for name in table.column_names]
+        self.total_rows = table.num_rows
+
+    def to_arrow_iterable(self, bqstorage_client=None) -> Iterator[pa.RecordBatch]:
+        """
+        逐頁產出 Arrow record batch（零複製切片）；`bqstorage_client` 僅為與 `RowIterator` 相容，不會使用。
+        """
+        yield from self._table.to_batches(max_chunksize=self._page_size)
+
+    def to_dataframe_iterable(self) -> Iterator[DataFrame]:
+        """
+        逐頁產出 DataFrame。
+        """
+        for batch in self.to_arrow_iterable():
+            yield batch.to_pandas()
+
+class FakeQueryJob:
+    """
+    模擬 `bigquery.QueryJob`：查詢已在建立時於記憶體中完成（dry run 時不含結果）。
+
+    屬性:
+        total_bytes_processed (int): 以快照檔中被讀取欄位的未壓縮大小估算的掃描量。
+        total_bytes_billed (int): dry run 時為 0，否則同 `total_bytes_processed`。
+        cache_hit (bool): 一律為 False。
+    """
+    def __init__(self, query: str, table: Optional[pa.Table], bytes_processed: int, dry_run: bool = False):
+        self.query = query
+        self._table = table
+        self.dry_run = dry_run
+        self.total_bytes_processed = bytes_processed
+        self.total_bytes_billed = 0 if dry_run else bytes_processed
+        self.cache_hit = False
+
+    def result(self, page_size: Optional[int] = None) -> FakeRowIterator:
+        return FakeRowIterator(self._table, page_size)
+
+    def to_arrow(self, create_bqstorage_client: bool = True) -> pa.Table:
+        return self._table
+
+    def to_dataframe(self) -> DataFrame:
+        return self._table.to_pandas()
+
+class FakeBigQueryClient:
+    """
+    FakeBigQueryClient 類別以本機快照檔模擬 Extractor 使用到的 `bigquery.Client` 介面，
+    讓整條提取流程可在沒有 GCP 的環境下重播與量測。
+
+    快照目錄內每張表一個檔案，檔名為 BigQuery 表名：`<table>.parquet`（優先，記憶體映射讀取）或 `<table>.csv`。
+
+    支援的 SQL 僅限 Extractor 產生的形式：
+    - `SELECT [DISTINCT] * | `col`, ... FROM `project.dataset.table` WHERE <條件> [AND ...]`
+      `[QUALIFY ROW_NUMBER() OVER (PARTITION BY `col`, ... ORDER BY <欄位或 CAST(col AS INT64)> DESC) = 1]`
+    - `job_config.dry_run` 為 True 時只估算掃描量（被引用欄位於快照檔中的未壓縮大小），不讀取資料。
+    - 條件：`` `col` IS NOT NULL ``、`` `col` = 常值 ``、`<欄位或 CAST(col AS INT64)> >|>=|<|<=|= 數值`、
+      以 OR 串接的 `` `col` IN (...) ``（可加括號）。
+
+    屬性:
+        snapshot_dir (str): 快照目錄。
+    """
+    def __init__(self, snapshot_dir: str):
+        """
+        初始化 FakeBigQueryClient 物件。
+
+        參數:
+            snapshot_dir (str): 快照目錄。
+        """
+        if not os.path.isdir(snapshot_dir):
+            raise FileNotFoundError(f"找不到快照目錄：{snapshot_dir}")
+        self.snapshot_dir = snapshot_dir
+        self.logger = logging.getLogger(__name__)
+        # CSV 解析成本高，解析後的 Arrow 表於記憶體中保留
+        self._csv_tables = {}
+        self._lock = threading.Lock()
+
+    def get_table(self, table_ref: str) -> FakeTable:
+        """
+        取得快照表的 schema（僅讀取檔案 metadata）。
+        """
+        path = self._path(table_ref)
+        if path.endswith('.parquet'):
+            names = pq.read_schema(path).names
+        else:
+            names = self._read_csv(path).column_names
+        return FakeTable([FakeSchemaField(name) for name in names])
+
+    def query(self, query: str, job_config=None) -> FakeQueryJob:
+        """
+        於記憶體中執行查詢並返回已完成的查詢工作。
+        """
+        match = re.match(
+            r"\s*SELECT\s+(DISTINCT\s+)?(.*?)\s+FROM\s+`([^`]+)`\s*(?:WHERE\s+(.*?))?"
+            r"(?:\s+QUALIFY\s+ROW_NUMBER\(\)\s+OVER\s*\(PARTITION\s+BY\s+(.*?)\s+ORDER\s+BY\s+(.*?)\s+DESC\)\s*=\s*1)?\s*$",
+            query, re.S | re.I)
+        if not match:
+            raise NotImplementedError(f"FakeBigQueryClient 不支援此查詢：{query}")
+        distinct, select_list, table_ref, where, partition, order_by = match.groups()
+        columns = None if select_list.strip() == '*' else re.findall(r"`([^`]+)`", select_list)
+
+        path = self._path(table_ref)
+        conditions = self._split_top_level(where, 'AND') if where else []
+        filter_columns = set(column for condition in conditions for column in self._referenced_columns(condition))
+        if partition:
+            partition_columns = re.findall(r"`([^`]+)`", partition)
+            filter_columns.update(partition_columns + self._referenced_columns(order_by))
+        read_columns = None if columns is None else list(dict.fromkeys(columns + sorted(filter_columns)))
+        bytes_processed = self._estimate_bytes(path, read_columns)
+        if job_config is not None and getattr(job_config, 'dry_run', False):
+            return FakeQueryJob(query, None, bytes_processed, dry_run=True)
+        dataframe = self._read(path, read_columns)
+
+        if conditions:
+            mask = pd.Series(True, index=dataframe.index)
+            for condition in conditions:
+                mask &= self._evaluate(condition, dataframe)
+            dataframe = dataframe[mask]
+        if partition:
+            dataframe = self._latest_per_partition(dataframe, partition_columns, order_by)
+        if columns is not None:
+            dataframe = dataframe[columns]
+        if distinct:
+            dataframe = dataframe.drop_duplicates()
+        table = pa.Table.from_pandas(dataframe.reset_index(drop=True), preserve_index=False)
+        return FakeQueryJob(query, table, bytes_processed)
+
+    def _path(self, table_ref: str) -> str:
+        """
+        由 `project.dataset.table` 找出快照檔路徑。
+        """
+        table = table_ref.split('.')[-1]
+        for extension in ('.parquet', '.csv'):
+            path = os.path.join(self.snapshot_dir, f"{table}{extension}")
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"快照目錄 {self.snapshot_dir} 中找不到資料表 {table}")
+
+    def _estimate_bytes(self, path: str, columns: Optional[List[str]]) -> int:
+        """
+        估算讀取指定欄位的掃描量：Parquet 取 metadata 中各欄位的未壓縮大小，CSV 取解析後的 Arrow 大小。
+        """
+        if path.endswith('.parquet'):
+            metadata = pq.read_metadata(path)
+            wanted = None if columns is None else set(columns)
+            total = 0
+            for row_group in range(metadata.num_row_groups):
+                group = metadata.row_group(row_group)
+                for index in range(group.num_columns):
+                    column = group.column(index)
+                    if wanted is None or column.path_in_schema.split('.')[0] in wanted:
+                        total += column.total_uncompressed_size
+            return total
+        table = self._read_csv(path)
+        return (table if columns is None else table.select(columns)).nbytes
+
+    def _read_csv(self, path: str) -> pa.Table:
+        """
+        讀取 CSV 快照；日期／時間欄位保留為字串，與 BigQuery 來源表的字串欄位一致。
+        """
+        with self._lock:
+            if path not in self._csv_tables:
+                table = pa_csv.read_csv(path)
+                temporal = {field.name: pa.string() for field in table.schema if pa.types.is_temporal(field.type)}
+                if temporal:
+                    table = pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(column_types=temporal))
+                self._csv_tables[path] = table
+            return self._csv_tables[path]
+
+    def _read(self, path: str, columns: Optional[List[str]]) -> DataFrame:
+        """
+        讀取快照檔的指定欄位；Parquet 以記憶體映射讀取，只解碼需要的欄位。
+        """
+        if path.endswith('.parquet'):
+            table = pq.read_table(path, columns=columns, memory_map=True)
+        else:
+            table = self._read_csv(path)
+            if columns is not None:
+                table = table.select(columns)
+        return table.to_pandas()
+
+    def _latest_per_partition(self, dataframe: DataFrame, partition_columns: List[str], order_by: str) -> DataFrame:
+        """
+        模擬 `QUALIFY ROW_NUMBER() OVER (PARTITION BY ... ORDER BY ... DESC) = 1`：各分組保留排序值最大的一筆。
+        """
+        match = re.fullmatch(r"`([^`]+)`|CAST\((\w+)\s+AS\s+INT64\)", order_by.strip(), re.I)
+        if not match:
+            raise NotImplementedError(f"FakeBigQueryClient 不支援此排序：{order_by}")
+        order_values = dataframe[match.group(1) or match.group(2)]
+        if match.group(2):
+            order_values = pd.to_numeric(order_values, errors='coerce')
+        # 與 BigQuery 相同，DESC 時 NULL 排在最後
+        order = order_values.reset_index(drop=True).sort_values(ascending=False, kind='stable', na_position='last').index
+        dataframe = dataframe.iloc[order]
+        return dataframe[~dataframe.duplicated(subset=partition_columns, keep='first')]
+
+    @staticmethod
+    def _split_top_level(expression: str, keyword: str) -> List[str]:
+        """
+        以最外層（不在括號或引號內）的 AND / OR 切分條件。
+        """
+        parts, depth, quote, start, i = [], 0, None, 0, 0
+        pattern = re.compile(rf"\s+{keyword}\s+", re.I)
+        while i < len(expression):
+            char = expression[i]
+            if quote:
+                if char == '\\':
+                    i += 2
+                    continue
+                if char == quote:
+                    quote = None
+            elif char in ("'", '"'):
+                quote = char
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            elif depth == 0:
+                match = pattern.match(expression, i)
+                if match:
+                    parts.append(expression[start:i].strip())
+                    start = i = match.end()
+                    continue
+            i += 1
+        parts.append(expression[start:].strip())
+        return parts
+
+    @staticmethod
+    def _referenced_columns(condition: str) -> List[str]:
+        return re.findall(r"`([^`]+)`", condition) + re.findall(r"CAST\((\w+)\s+AS", condition, re.I)
+
+    @staticmethod
+    def _literal(text: str):
+        text = text.strip()
+        upper = text.upper()
+        if upper in ('TRUE', 'FALSE'):
+            return upper == 'TRUE'
+        if text.startswith("'") and text.endswith("'"):
+            return text[1:-1].replace("\\'", "'").replace("\\\\", "\\")
+        return float(text)
+
+    def _evaluate(self, condition: str, dataframe: DataFrame) -> pd.Series:
+        """
+        計算單一條件的布林遮罩。
+        """
+        condition = condition.strip()
+        while condition.startswith('(') and condition.endswith(')'):
+            condition = condition[1:-1].strip()
+
+        alternatives = self._split_top_level(condition, 'OR')
+        if len(alternatives) > 1:
+            mask = pd.Series(False, index=dataframe.index)
+            for alternative in alternatives:
+                mask |= self._evaluate(alternative, dataframe)
+            return mask
+
+        match = re.fullmatch(r"`([^`]+)`\s+IS\s+NOT\s+NULL", condition, re.I)
+        if match:
+            return dataframe[match.group(1)].notna()
+        match = re.fullmatch(r"`([^`]+)`\s+IN\s+\((.*)\)", condition, re.I | re.S)
+        if match:
+            values = [self._literal(value) for value in re.findall(r"'(?:[^'\\]|\\.)*'|[^,\s]+", match.group(2))]
+            return dataframe[match.group(1)].isin(values).fillna(False).astype(bool)
+        match = re.fullmatch(r"(?:`([^`]+)`|CAST\((\w+)\s+AS\s+INT64\))\s*(<=|>=|=|<|>)\s*(.+)", condition, re.I | re.S)
+        if match:
+            column = match.group(1) or match.group(2)
+            value = self._literal(match.group(4))
+            series = dataframe[column]
+            if match.group(2) or isinstance(value, float):
+                series = pd.to_numeric(series, errors='coerce')
+            operator = match.group(3)
+            result = {
+                '<=': lambda: series <= value, '>=': lambda: series >= value, '=': lambda: series == value,
+                '<': lambda: series < value, '>': lambda: series > value,
+            }[operator]()
+            return result.fillna(False).astype(bool)
+        raise NotImplementedError(f"FakeBigQueryClient 不支援此條件：{condition}")
@@ -1,4 +1,13 @@
+import json
+import logging
+import time
+
+import pandas as pd
+
+from config import Config
+from etl.cache import ExtractionCache
 from etl.extractor import Extractor
+from etl.fake_bigquery import FakeBigQueryClient
 from etl.transform.cola_transformer import ColaTransformer
 from etl.transform.set_transformer import SetTransformer
 from etl.transform.lion_transformer import LionTransformer
@@ -6,7 +15,9 @@ from etl.transform.eztravel_transformer import EztravelTransformer
 from etl.transform.foreign_supplier_eztravel_transformer import ForeignSupplierEztravelTransformer
 from etl.transform.rich_transformer import RichTransformer
 from etl.transform.unified_transformer import UnifiedTransformer
+from etl.transform.fingerprint import drop_duplicate_rows
 from etl.loader import Loader
+from etl.watermark import WatermarkStore
 
 class Pipeline:
     def __init__(self, project_id: str):
@@ -16,15 +27,33 @@ class Pipeline:
         參數：
         project_id (str): 專案 ID。
         """
-        self.extractor = Extractor(project_id=project_id)
-        self.cola_transformer = ColaTransformer()
+        # 本次執行的快照時間：提取的時間窗口上界，也是 Cola 缺少建立時間時補上的值（各分塊共用）
+        snapshot_timestamp = Config.EXTRACT_SNAPSHOT_TS if Config.EXTRACT_SNAPSHOT_TS is not None else int(time.time())
+        self.cola_transformer = ColaTransformer(run_timestamp=snapshot_timestamp)
         self.set_transformer = SetTransformer()
         self.lion_transformer = LionTransformer()
         self.eztravel_transformer = EztravelTransformer()
         self.foreign_supplier_eztravel_transformer = ForeignSupplierEztravelTransformer()
         self.rich_transformer = RichTransformer()
-        self.unified_transformer = UnifiedTransformer()
-        self.loader = Loader()
+        self.extractor = Extractor(project_id=project_id,
+                                   max_workers=Config.EXTRACT_MAX_WORKERS,
+                                   projections=self._source_projections() if Config.EXTRACT_COLUMN_PROJECTION else None,
+                                   use_arrow=Config.EXTRACT_USE_ARROW,
+                                   snapshot_timestamp=snapshot_timestamp,
+                                   watermark_store=self._watermark_store(),
+                                   cache=self._extraction_cache(),
+                                   client=self._extraction_client(),
+                                   dedup=Config.EXTRACT_DEDUP,
+                                   dry_run=Config.EXTRACT_DRY_RUN,
+                                   max_bytes_per_query=Config.EXTRACT_MAX_BYTES_PER_QUERY,
+                                   max_bytes_per_run=Config.EXTRACT_MAX_BYTES_PER_RUN)
+        self.unified_transformer = UnifiedTransformer(supplier_reduction=Config.SUPPLIER_REDUCTION)
+        self.loader = Loader(method=Config.LOAD_METHOD,
+                             batch_rows=Config.LOAD_BATCH_ROWS,
+                             batch_target_seconds=Config.LOAD_BATCH_TARGET_SECONDS,
+                             mode=Config.LOAD_MODE,
+                             parallelism=Config.LOAD_PARALLELISM)
+        self.logger = logging.getLogger(__name__)
 
     def run(self):
         """
@@ -35,23 +64,145 @@ class Pipeline:
         3. 整合資料
         4. 寫入 Cloud SQL
         """
-        cola_df = self.extractor.extract_cola_data()
-        set_df = self.extractor.extract_set_data()
-        lion_df = self.extractor.extract_lion_data()
-        eztravel_df = self.extractor.extract_eztravel_data()
-        foreign_supplier_eztravel_df = self.extractor.extract_foreign_supplier_eztravel_data()
-        rich_df = self.extractor.extract_rich_data()
-        cola_cleaned_df = self.cola_transformer.clean_data(df=cola_df)
-        set_cleaned_df = self.set_transformer.clean_data(df=set_df)
-        lion_cleaned_df = self.lion_transformer.clean_data(df=lion_df)
-        eztravel_cleaned_df = self.eztravel_transformer.clean_data(df=eztravel_df)
-        foreign_supplier_eztravel_cleaned_df = self.foreign_supplier_eztravel_transformer.clean_data(df=foreign_supplier_eztravel_df)
-        rich_cleaned_df = self.rich_transformer.clean_data(df=rich_df)
+        if Config.EXTRACT_CHUNK_ROWS > 0:
+            cleaned = self._extract_and_clean_in_chunks(Config.EXTRACT_CHUNK_ROWS)
+        else:
+            frames = self._extract()
+            cleaned = {source: transformer.clean_data(df=frames[source])
+                       for source, transformer in self._source_transformers().items()}
+        self.logger.info("提取指標：%s", json.dumps({'run': self.extractor.run_metrics, 'scans': self.extractor.metrics},
+                                                  ensure_ascii=False, default=str))
+        cola_cleaned_df = cleaned['cola']
+        set_cleaned_df = cleaned['set']
+        lion_cleaned_df = cleaned['lion']
+        eztravel_cleaned_df = cleaned['eztravel']
+        foreign_supplier_eztravel_cleaned_df = cleaned['foreign_supplier_eztravel']
+        rich_cleaned_df = cleaned['rich']
         unified_df = self.unified_transformer.unify_data(cola_df=cola_cleaned_df,
                                                          set_df=set_cleaned_df,
                                                          lion_df=lion_cleaned_df,
                                                          eztravel_df=eztravel_cleaned_df,
                                                          foreign_supplier_eztravel_df=foreign_supplier_eztravel_cleaned_df,
                                                          rich_df=rich_cleaned_df)
-        unified_df = unified_df.sort_values('creation_time', ascending=False).drop_duplicates(subset=[col for col in unified_df.columns if col != 'creation_time'], keep='first')
-        self.loader.truncate_and_load(unified_df)
+        self.logger.info("整併指標：%s", json.dumps({'supplier_reduction': self.unified_transformer.supplier_reduction,
+                                                  'rows_reduced': self.unified_transformer.supplier_rows_reduced,
+                                                  'join_fan_out': self.unified_transformer.join_fan_out},
+                                                 ensure_ascii=False))
+        rows_before = len(unified_df)
+        unified_df = drop_duplicate_rows(unified_df, time_column='creation_time')
+        self.logger.info("移除重複資料 %d 筆（%d -> %d）", rows_before - len(unified_df), rows_before, len(unified_df))
+        if Config.EXTRACT_INCREMENTAL:
+            # 增量提取只包含水位線之後的 Cola 資料：依業務鍵取代同鍵資料列，並刪除超出時間窗口的舊資料
+            self.loader.upsert_load(unified_df, expire_before=self.extractor.window_start)
+        else:
+            self.loader.replace_table(unified_df)
+        self.extractor.commit_watermarks()
+
+    def _source_transformers(self):
+        """
+        取得各來源對應的 Transformer。
+
+        返回：
+        dict: 來源名稱對應 Transformer。
+        """
+        return {
+            'cola': self.cola_transformer,
+            'set': self.set_transformer,
+            'lion': self.lion_transformer,
+            'eztravel': self.eztravel_transformer,
+            'foreign_supplier_eztravel': self.foreign_supplier_eztravel_transformer,
+            'rich': self.rich_transformer,
+        }
+
+    def _source_projections(self):
+        """
+        收集各來源 Transformer 宣告需要的原始欄位，供 Extractor 組出 SELECT 欄位清單。
+
+        返回：
+        dict: 來源名稱對應欄位清單。
+        """
+        return {source: transformer.source_columns for source, transformer in self._source_transformers().items()}
+
+    def _watermark_store(self):
+        """
+        依設定建立增量提取的水位線儲存；未啟用增量提取時不使用水位線。
+
+        返回：
+        WatermarkStore: 水位線儲存或 None。
+
+        異常：
+        - ValueError: 啟用增量提取但未設定 `EXTRACT_WATERMARK_PATH` 時
+        """
+        if not Config.EXTRACT_INCREMENTAL:
+            return None
+        if not Config.EXTRACT_WATERMARK_PATH:
+            raise ValueError("啟用 EXTRACT_INCREMENTAL 時須以 EXTRACT_WATERMARK_PATH 指定跨執行保留的水位線檔案位置")
+        return WatermarkStore(Config.EXTRACT_WATERMARK_PATH)
+
+    def _extraction_cache(self):
+        """
+        依設定建立本機提取快取；未設定 `EXTRACT_CACHE_DIR` 時不使用快取。
+
+        返回：
+        ExtractionCache: 快取物件或 None。
+        """
+        if not Config.EXTRACT_CACHE_DIR:
+            return None
+        return ExtractionCache(directory=Config.EXTRACT_CACHE_DIR,
+                               ttl_seconds=Config.EXTRACT_CACHE_TTL_SECONDS,
+                               max_bytes=Config.EXTRACT_CACHE_MAX_BYTES,
+                               refresh=Config.EXTRACT_CACHE_REFRESH)
+
+    def _extraction_client(self):
+        """
+        依 `EXTRACT_BACKEND` 選擇提取來源的客戶端。
+
+        返回：
+        FakeBigQueryClient: 離線快照客戶端；使用 BigQuery 時為 None（由 Extractor 自行建立）。
+        """
+        if Config.EXTRACT_BACKEND == 'bigquery':
+            return None
+        if Config.EXTRACT_BACKEND == 'files':
+            return FakeBigQueryClient(Config.EXTRACT_SNAPSHOT_DIR)
+        raise ValueError(f"未知的 EXTRACT_BACKEND：{Config.EXTRACT_BACKEND}")
+
+    def _extract(self):
+        """
+        從 BigQuery 提取六個來源的資料。
+
+        依 `Config.EXTRACT_CONCURRENT` 決定並行提取或逐一提取。
+
+        返回：
+        dict: 來源名稱對應的 DataFrame。
+        """
+        if Config.EXTRACT_CONCURRENT:
+            return self.extractor.extract_all()
+        return {
+            'cola': self.extractor.extract_cola_data(),
+            'set': self.extractor.extract_set_data(),
+            'lion': self.extractor.extract_lion_data(),
+            'eztravel': self.extractor.extract_eztravel_data(),
+            'foreign_supplier_eztravel': self.extractor.extract_foreign_supplier_eztravel_data(),
+            'rich': self.extractor.extract_rich_data(),
+        }
+
+    def _extract_and_clean_in_chunks(self, chunk_rows):
+        """
+        逐塊提取並清洗各來源資料，使原始資料的記憶體用量以 `chunk_rows` 為上限。
+
+        每塊原始資料清洗後即釋放，僅保留清洗後的結果；各 Transformer 的 `clean_data` 皆為逐列處理，
+        因此分塊清洗後再合併的結果與一次清洗相同。
+
+        參數：
+        chunk_rows (int): 每塊最多筆數。
+
+        返回：
+        dict: 來源名稱對應清洗後的 DataFrame。
+        """
+        transformers = self._source_transformers()
+        cleaned_chunks = {source: [] for source in transformers}
+        for scan_sources in self.extractor.plan_scans(transformers).values():
+            for chunk in self.extractor.iter_scan(scan_sources, chunk_rows):
+                for source, frame in chunk.items():
+                    cleaned_chunks[source].append(transformers[source].clean_data(df=frame))
+        return {source: pd.concat(frames, ignore_index=True) for source, frames in cleaned_chunks.items()}
@@ -0,0 +1,202 @@
+# 標準庫
+import logging
+from typing import Dict, List
+
+# 外部庫
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+# 輸出資料表
+FLIGHT_TICKET_PRICE_COMPARE_TABLE = 'domanda.flight_ticket_price_compare'
+
+# 欄位型別對應的 pandas dtype：
+# - "string"：Arrow 字串（`string[pyarrow]`），用於基數高的欄位（航班編號、時間、日期）。
+# - "category"：類別（類別值為 Arrow 字串），用於基數低的代碼（航司、機場、艙等、機型、單位等）。
+# - "Int32"/"Int64"：可為空的整數；非整數值四捨五入（遠離零）並記錄警告。
+# - "float64"：浮點數（以 NaN 表示空值）。
+_PANDAS_DTYPES = {
+    'string': pd.StringDtype(storage='pyarrow'),
+    'category': 'category',
+    'Int32': 'Int32',
+    'Int64': 'Int64',
+    'float64': 'float64',
+}
+
+
+def _column(name: str, type_: str, nullable: bool = True) -> dict:
+    return {'name': name, 'type': type_, 'nullable': nullable}
+
+
+def _legs(template: str, type_: str) -> List[dict]:
+    """
+    依 `_rename_columns` 的輸出順序展開各航段欄位：第 1~3 段，每段先去程（departure）後回程（return）。
+    """
+    return [_column(template.format(prefix=prefix, i=i), type_)
+            for i in range(1, 4) for prefix in ('departure', 'return')]
+
+
+def _airports() -> List[dict]:
+    return [_column(f'{name}_{i}', 'category')
+            for i in range(1, 4)
+            for name in ('departure_airport', 'departure_arrival_airport', 'return_airport', 'return_arrival_airport')]
+
+
+def _flight_times() -> List[dict]:
+    return [_column(f'{name}_{i}', 'string')
+            for i in range(1, 4)
+            for name in ('departure_flight_time', 'departure_arrival_flight_time', 'return_flight_time', 'return_arrival_flight_time')]
+
+
+def _luggage() -> List[dict]:
+    return [_column(f'{prefix}_luggage_{field}_{i}', 'float64' if field == 'value' else 'category')
+            for i in range(1, 4) for prefix in ('departure', 'return') for field in ('value', 'unit')]
+
+
+# `domanda.flight_ticket_price_compare` 的欄位定義（依輸出欄位順序）：欄位名稱、型別（見 `_PANDAS_DTYPES`）與是否可為空
+FLIGHT_TICKET_PRICE_COMPARE_SCHEMA = [
+    *_legs('{prefix}_airline_{i}', 'category'),
+    *_airports(),
+    *_flight_times(),
+    *_legs('{prefix}_aircraft_type_{i}', 'category'),
+    *_luggage(),
+    *_legs('{prefix}_flight_duration_{i}', 'Int32'),
+    *_legs('{prefix}_flight_number_{i}', 'string'),
+    *_legs('{prefix}_cabin_class_{i}', 'category'),
+    _column('departure_transfer_count', 'Int32', nullable=False),
+    _column('return_transfer_count', 'Int32', nullable=False),
+    _column('gds_type', 'category'),
+    # 價格、稅金與金額欄位：正式表 DDL 未確認為整數型別前維持 float64，原值寫入（不四捨五入）
+    _column('ticket_price', 'float64'),
+    _column('ticket_price_markup_percentage', 'float64'),
+    _column('tax', 'float64'),
+    _column('tax_markup_percentage', 'float64'),
+    _column('final_price', 'float64'),
+    _column('departure_date', 'string'),
+    _column('return_date', 'string'),
+    _column('creation_time', 'float64', nullable=False),
+    *[_column(f'{supplier}_{kind}', 'float64')
+      for supplier, kinds in (('ezfly', ('ticket_price', 'tax')),
+                              ('eztravel', ('ticket_air_tickets_price', 'tax')),
+                              ('foreign_supplier_eztraval', ('ticket_air_tickets_price', 'tax')),
+                              ('lion', ('air_tickets_price', 'tax')),
+                              ('settour', ('air_tickets_price', 'tax')),
+                              ('rich_mond', ('air_tickets_price', 'tax')))
+      for kind in kinds],
+    _column('net_price_or_ticket_price', 'category'),
+    _column('ticket_rule_type', 'category'),
+    _column('kp', 'float64'),
+    _column('discount', 'float64'),
+    _column('activity_fee_adjustment', 'float64'),
+]
+
+
+# 業務鍵：去回程各段航班編號與艙等、去回程日期（差異寫入時以業務鍵為單位比對與替換資料列）
+FLIGHT_TICKET_PRICE_COMPARE_KEY = [
+    *[f'{prefix}_flight_number_{i}' for prefix in ('departure', 'return') for i in range(1, 4)],
+    *[f'{prefix}_cabin_class_{i}' for prefix in ('departure', 'return') for i in range(1, 4)],
+    'departure_date', 'return_date',
+]
+
+
+def schema_dtypes(schema: List[dict] = FLIGHT_TICKET_PRICE_COMPARE_SCHEMA) -> Dict[str, object]:
+    """
+    取得各欄位對應的 pandas dtype。
+
+    參數:
+        schema (List[dict]): 欄位定義。
+
+    返回:
+        Dict[str, object]: 欄位名稱對應 dtype。
+    """
+    return {column['name']: _PANDAS_DTYPES[column['type']] for column in schema}
+
+
+def _coerce_column(series: pd.Series, type_: str) -> pd.Series:
+    """
+    將單一欄位轉為指定型別；已是目標型別時原樣返回。
+    """
+    dtype = _PANDAS_DTYPES[type_]
+    if type_ == 'category':
+        if isinstance(series.dtype, pd.CategoricalDtype) and series.dtype.categories.dtype == _PANDAS_DTYPES['string']:
+            return series
+        return series.astype(_PANDAS_DTYPES['string']).astype('category')
+    if series.dtype == dtype:
+        return series
+    if type_ == 'string':
+        return series.astype(dtype)
+
+    numeric = pd.to_numeric(series, errors='coerce')
+    lost = int((numeric.isna() & series.notna()).sum())
+    if lost:
+        logger.warning("欄位 %s 有 %d 筆值無法轉為數值，已視為空值", series.name, lost)
+    if type_ == 'float64':
+        return numeric.astype('float64')
+    # 整數欄位：非整數值四捨五入（.5 遠離零），空值與無限值為 <NA>
+    values = numeric.to_numpy(dtype='float64', na_value=np.nan)
+    finite = np.isfinite(values)
+    rounded = np.sign(values) * np.floor(np.abs(values) + 0.5)
+    fractional = int((finite & (rounded != values)).sum())
+    if fractional:
+        logger.warning("欄位 %s 有 %d 筆非整數值，已四捨五入為整數", series.name, fractional)
+    values = np.where(finite, rounded, np.nan)
+    return pd.Series(values, index=series.index, name=series.name).astype(dtype)
+
+
+def coerce_to_schema(df: DataFrame, schema: List[dict] = FLIGHT_TICKET_PRICE_COMPARE_SCHEMA) -> DataFrame:
+    """
+    將資料表轉為 schema 定義的欄位順序與型別。
+
+    作法：
+    - 依 schema 順序輸出欄位；缺少的欄位補上該型別的空欄位。
+    - 字串欄位轉為 `string[pyarrow]`、低基數代碼轉為 category、整數轉為可為空的 Int32/Int64（非整數值四捨五入）；已是目標型別的欄位不複製。
+    - 所有欄位最後一次組成 DataFrame。
+
+    參數:
+        df (DataFrame): 要轉換的資料表。
+        schema (List[dict]): 欄位定義，預設為 `FLIGHT_TICKET_PRICE_COMPARE_SCHEMA`。
+
+    返回:
+        DataFrame: 欄位與型別符合 schema 的資料表（索引不變）。
+
+    例外:
+        ValueError: 資料表含 schema 未定義的欄位，或不可為空的欄位出現空值時拋出。
+    """
+    names = [column['name'] for column in schema]
+    unknown = [column for column in df.columns if column not in names]
+    if unknown:
+        raise ValueError(f"資料表含 schema 未定義的欄位：{unknown}")
+
+    columns = {}
+    for column in schema:
+        name = column['name']
+        if name in df.columns:
+            series = _coerce_column(df[name], column['type'])
+        else:
+            series = pd.Series(pd.NA, index=df.index, name=name, dtype=object).pipe(_coerce_column, column['type'])
+        if not column['nullable']:
+            nulls = int(series.isna().sum())
+            if nulls:
+                raise ValueError(f"欄位 {name} 不可為空，但有 {nulls} 筆空值")
+        columns[name] = series
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def to_python_records(df: DataFrame) -> List[dict]:
+    """
+    將資料表轉為以 Python 原生型別表示的 dict 清單（空值為 None），供資料庫驅動程式寫入。
+
+    作法：
+    - 逐欄轉換一次（而非逐格判斷型別）：整數為 int、浮點數為 float、字串與類別為 str。
+
+    參數:
+        df (DataFrame): 已依 schema 轉換的資料表。
+
+    返回:
+        List[dict]: 每列一個 dict。
+    """
+    values = [df[name].astype(object).where(df[name].notna(), None).tolist() for name in df.columns]
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*values)]
@@ -1,15 +1,106 @@
 from abc import ABC, abstractmethod
+from typing import List, Optional
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from etl.transform.parsers import apply_unique, cached_canonical_join_date, cached_canonical_join_key
+
+# 供應商（東南、雄獅、易遊網、山富）清洗與整併實際使用的原始欄位：
+# 去回程日期、票面價格、稅金，以及去回程各三段的航班編號與艙等。
+SUPPLIER_SOURCE_COLUMNS = [
+    '去程日期', '回程日期', '票面價格', '稅金',
+    *[f'{leg}{field}{i}' for leg in ('去程', '回程') for i in range(1, 4) for field in ('航班編號', '艙等')],
+]
+
+# 改名後的航班編號欄位：去回程各三段
+FLIGHT_NUMBER_COLUMNS = [
+    *[f'去程_航班編號{i}' for i in range(1, 4)],
+    *[f'回程_航班編號{i}' for i in range(1, 4)],
+]
+
+# 整併時各來源 join 的鍵欄位：航班編號、艙等（去回程各三段）與去回程日期
+JOIN_KEY_COLUMNS = [
+    *[f'去程_航班編號{i}' for i in range(1, 4)],
+    *[f'去程_艙等{i}' for i in range(1, 4)],
+    *[f'回程_航班編號{i}' for i in range(1, 4)],
+    *[f'回程_艙等{i}' for i in range(1, 4)],
+    '出發日期', '返回日期',
+]
+JOIN_DATE_COLUMNS = ['出發日期', '返回日期']
+
+# `DataFrame.attrs` 中標記 join 鍵已正規化的鍵名；UnifiedTransformer 見到此標記即直接使用，不再複製與正規化
+JOIN_KEYS_NORMALIZED = 'join_keys_normalized'
+
+# 有效航班編號：2 碼英數字 + 3~4 碼數字
+_VALID_FLIGHT_NUMBER = re.compile(r"^[A-Z0-9]{2}\d{3,4}$")
+
+# 無效航班編號警告中最多列出的不同值數量
+_MAX_LOGGED_INVALID_VALUES = 20
+
+def normalize_flight_number_values(values: pd.Series) -> pd.Series:
+    """
+    正規化航班編號：移除所有空白、轉大寫，數字部分不足三碼時補零（例如 CI73 -> CI073、CI7 -> CI007）。
+
+    參數：
+        values (Series): 航班編號（通常為某欄位的不重複值）。
+
+    返回：
+        Series: 正規化後的字串；空值轉為空字串。
+    """
+    s = values.fillna("").astype(str)
+    s = s.str.strip().str.replace(r"\s+", "", regex=True).str.upper()
+    s = s.str.replace(r"^([A-Z0-9]{2})(\d{2})$", r"\g<1>0\g<2>", regex=True)
+    s = s.str.replace(r"^([A-Z0-9]{2})(\d{1})$", r"\g<1>00\g<2>", regex=True)
+    return s
+
+def normalize_join_keys(df: DataFrame) -> DataFrame:
+    """
+    將 join 鍵欄位正規化為整併時比對用的標準形式（就地修改），並於 `df.attrs` 標記 `JOIN_KEYS_NORMALIZED`。
+
+    作法：
+    - 缺少的鍵欄位補上空字串。
+    - 航班編號與艙等以 `canonical_join_key` 正規化（空值字面值轉空字串、移除空白、轉大寫）；
+      日期以 `canonical_join_date` 正規化為 MM/DD。
+    - 每欄只處理不重複值（`apply_unique`），解析結果跨欄位與跨次執行快取。
+
+    參數：
+        df (DataFrame): 清洗後的資料框。
+
+    返回：
+        DataFrame: 同一個資料框（鍵欄位皆為字串）。
+    """
+    for column in JOIN_KEY_COLUMNS:
+        if column not in df.columns:
+            df[column] = ''
+            continue
+        parser = cached_canonical_join_date if column in JOIN_DATE_COLUMNS else cached_canonical_join_key
+        df[column] = apply_unique(df[column], parser).astype(object)
+    df.attrs[JOIN_KEYS_NORMALIZED] = True
+    return df
 
 class BaseTransformer(ABC):
     """
     BaseTransformer 類別作為所有 Transformer 的基礎類別，提供通用的數據清理方法。
+
+    屬性：
+        source_columns (Optional[List[str]]): 此 Transformer 需要的原始欄位，供 Extractor 組出 SELECT 欄位清單；
+            為 None 時代表需要全部欄位。
     """
 
+    source_columns: Optional[List[str]] = None
+
     @abstractmethod
     def clean_data(self, df):
         """
         抽象方法，必須在子類中實現。
 
+        實作須為逐列處理（不依賴整體資料的統計），使 Pipeline 分塊清洗後再合併的結果與一次清洗相同；
+        並應於最後呼叫 `_normalize_join_keys`，讓 UnifiedTransformer 直接使用已正規化的 join 鍵。
+
         參數：
             df (DataFrame): 需要清理的 DataFrame。
 
@@ -17,3 +108,63 @@ class BaseTransformer(ABC):
             DataFrame: 清理後的 DataFrame。
         """
         pass
+
+    def _normalize_join_keys(self, df: DataFrame) -> DataFrame:
+        """
+        於清洗最後正規化 join 鍵（見 `normalize_join_keys`），使整併階段不必再複製與逐列處理各來源資料框。
+
+        參數：
+            df (DataFrame): 清洗後的資料框。
+
+        返回：
+            DataFrame: join 鍵已正規化並標記的資料框。
+        """
+        return normalize_join_keys(df)
+
+    def _handle_flight_number(self, df: DataFrame) -> DataFrame:
+        """
+        正規化各段航班編號並移除含無效航班編號的資料列（供各供應商 Transformer 共用）。
+
+        作法：
+        - 將所有航班欄位串接後一次 factorize，只對不重複值執行正規化與格式檢查，再以代碼映射回各欄位。
+        - 任一非空航班欄位不符合「2 碼英數字 + 3~4 碼數字」的列即移除。
+        - 被移除的資料彙總為一筆警告（筆數與各無效值出現次數），逐列明細僅以 DEBUG 等級記錄。
+
+        參數：
+            df (DataFrame): 已改名為 `去程_航班編號{n}`／`回程_航班編號{n}` 的資料框。
+
+        返回：
+            DataFrame: 航班編號正規化且移除無效列後的資料框。
+        """
+        flight_cols = [c for c in FLIGHT_NUMBER_COLUMNS if c in df.columns]
+        if not flight_cols or df.empty:
+            return df
+
+        row_count = len(df)
+        stacked = pd.concat([df[col] for col in flight_cols], ignore_index=True)
+        codes, uniques = pd.factorize(stacked, use_na_sentinel=True)
+        normalized = normalize_flight_number_values(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+        invalid = np.array([value != "" and _VALID_FLIGHT_NUMBER.match(value) is None for value in normalized], dtype=bool)
+        # 代碼 -1（空值）對應到附加在最後的空字串
+        normalized = np.append(normalized, "")
+        invalid = np.append(invalid, False)
+        codes = codes.reshape(len(flight_cols), row_count)
+
+        for position, col in enumerate(flight_cols):
+            df[col] = normalized[codes[position]]
+
+        invalid_cells = invalid[codes]
+        invalid_row_mask = invalid_cells.any(axis=0)
+        if invalid_row_mask.any():
+            logger = logging.getLogger(__name__)
+            invalid_counts = pd.Series(normalized[codes[invalid_cells]]).value_counts()
+            logger.warning(
+                "移除 %d 筆無效航班編號資料（共 %d 種無效值），出現次數最多者：%s",
+                int(invalid_row_mask.sum()), len(invalid_counts),
+                invalid_counts.head(_MAX_LOGGED_INVALID_VALUES).to_dict(),
+            )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("無效航班編號資料明細：\n%s", df.loc[invalid_row_mask, flight_cols].to_string())
+            df = df.loc[~invalid_row_mask].copy()
+
+        return df
@@ -1,14 +1,12 @@
 # 外部庫
+from typing import Optional
+
 from pandas import DataFrame
-import pandas as pd
 import time
-import math
-import re
-from datetime import datetime
-from typing import Optional, Tuple
 
 # 本地庫
 from etl.transform.base_transformer import BaseTransformer
+from etl.transform.parsers import format_dates, parse_dates, parse_luggage
 
 
 class ColaTransformer(BaseTransformer):
@@ -18,14 +16,41 @@ class ColaTransformer(BaseTransformer):
 
     目標：
     - 以一致且可維護的方式，取得後續整併所需的關鍵中文欄位：
-      `去程_航班編號{1..3}`、`回程_航班編號{1..3}`、`去程_艙等{1..3}`、`回程_艙等{1..3}`、`出發日期`、`返回日期`、`去程行李{1..3}`、`回程行李{1..3}`。
+      `去程_航班編號{1..3}`、`回程_航班編號{1..3}`、`去程_艙等{1..3}`、`回程_艙等{1..3}`、`出發日期`、`返回日期`、
+      `去程行李數值{1..3}`／`去程行李單位{1..3}`（回程同）。
     - 日期採用 YYYY/MM/DD 格式，避免日後再推斷年份。
 
     注意：
     - 僅針對 Cola 做清洗更動；其他來源不受影響。
-    - 行李欄位以內部 `split_luggage` 方法規整為無多餘空白、單位標準化（件 / 公斤）的字串，例如："1件"、"25公斤"。
+    - 行李欄位以 `parsers.parse_luggage` 解析一次，拆為數值（float）與標準化單位（件 / 公斤）兩欄，
+      UnifiedTransformer 直接沿用，不再重複解析。
     """
 
+    # 供 Extractor 組 SELECT 欄位清單：`_rename_columns_to_standard` 的來源欄位，
+    # 加上行李、稅金、折扣、固定金額與建立時間等於 UnifiedTransformer 直接取用的欄位。
+    source_columns = [
+        *[
+            f'{leg}{field}{i}'
+            for leg in ('去程', '回程')
+            for i in (1, 2, 3)
+            for field in ('航班編號', '艙等與艙等編碼', '起飛時間', '降落時間', '起飛機場', '降落機場',
+                          '飛機公司及型號', '飛行時間', '行李')
+        ],
+        '基礎票價', '票價加價成數', '稅金', '稅金加價成數', '總售價',
+        '票型', '公式類型', 'GDS Type', '折讓百分比', '折扣', '固定金額', '建立時間',
+        'ezfly_ticket_price', 'ezfly_tax',
+    ]
+
+    def __init__(self, run_timestamp: Optional[float] = None):
+        """
+        初始化 ColaTransformer。
+
+        參數：
+        - run_timestamp：缺少 `建立時間` 時補上的時間（epoch 秒），通常為本次執行的快照時間；
+          None 代表建立物件當下。整次執行共用同一個值，分塊清洗與一次清洗的結果相同。
+        """
+        self.run_timestamp = run_timestamp if run_timestamp is not None else time.time()
+
     def clean_data(self, df: DataFrame) -> DataFrame:
         """
         清洗傳入的 DataFrame，返回清洗後的 DataFrame。
@@ -37,7 +62,7 @@ class ColaTransformer(BaseTransformer):
         - DataFrame：欄位與格式經規整後的 DataFrame。
 
         範例：
-        - 產出欄位將包含（若原始資料具備）：`去程_航班編號1`、`回程_航班編號1`、`去程_艙等1`、`回程_艙等1`、`出發日期`、`返回日期`、`去程行李1`、`回程行李1` 等。
+        - 產出欄位將包含（若原始資料具備）：`去程_航班編號1`、`回程_航班編號1`、`去程_艙等1`、`回程_艙等1`、`出發日期`、`返回日期`、`去程行李數值1`、`去程行李單位1` 等。
         """
         df = self._rename_columns_to_standard(df)
         df = self._normalize_cabin_class(df)
@@ -45,79 +70,9 @@ class ColaTransformer(BaseTransformer):
         df = self._handle_date(df)
         df = self._ensure_required_columns(df)
         df = self._ensure_metadata(df)
+        df = self._normalize_join_keys(df)
         return df
 
-    def to_date_yyyy_slash_mm_slash_dd(self, value: Optional[str]) -> str:
-        """
-        簡單描述
-        將日期或日期時間字串轉換為 YYYY/MM/DD 格式。
-
-        參數：
-        - value：日期或日期時間字串，如 "2025-11-05 19:20:00"、"2025/11/05"。
-
-        返回：
-        - str："YYYY/MM/DD" 字串；若無法解析則回傳空字串。
-
-        範例：
-        - 輸入："2025-11-05 19:20:00" → 輸出："2025/11/05"
-        - 輸入："2025/11/05" → 輸出："2025/11/05"
-        """
-        if value is None or (isinstance(value, float) and math.isnan(value)):
-            return ""
-        if not isinstance(value, str):
-            value = str(value)
-        value = value.strip()
-        if not value:
-            return ""
-        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%Y/%m/%d %H:%M", "%Y/%m/%d"):
-            try:
-                dt = datetime.strptime(value, fmt)
-                return dt.strftime("%Y/%m/%d")
-            except Exception:
-                pass
-        # Try to parse ISO-like with pandas as fallback
-        try:
-            dt = pd.to_datetime(value, errors="coerce")
-            if pd.notna(dt):
-                return dt.strftime("%Y/%m/%d")
-        except Exception:
-            pass
-        return ""
-
-    def split_luggage(self, value: Optional[str]) -> Tuple[Optional[float], str]:
-        """
-        簡單描述
-        解析行李欄位為（數值, 單位）。將單位正規化為「件」或「公斤」。
-
-        參數：
-        - value：行李描述，如 "1件"、"25 公斤"、"2 件"。
-
-        返回：
-        - Tuple[Optional[float], str]：數值（float 或 None）與單位（"件"/"公斤"/空字串）。
-
-        範例：
-        - 輸入："1件" → 輸出：(1.0, "件")
-        - 輸入："25 公斤" → 輸出：(25.0, "公斤")
-        - 輸入："無" → 輸出：(None, "")
-        """
-        if value is None or (isinstance(value, float) and math.isnan(value)):
-            return None, ""
-        if not isinstance(value, str):
-            value = str(value)
-        value = value.strip()
-        if not value:
-            return None, ""
-        # Examples: "1件", "25公斤", "30 公斤", "2 件"
-        num_match = re.search(r"(\d+(?:\.\d+)?)", value)
-        unit = re.sub(r"[\d\s\.]+", "", value)
-        number = float(num_match.group(1)) if num_match else None
-        # Normalize units to exactly hk4g4 uses: 件 / 公斤
-        if "件" in unit:
-            unit = "件"
-        elif any(u in unit for u in ["公斤", "kg", "KG", "Kg"]):
-            unit = "公斤"
-        return number, unit
-
     def _rename_columns_to_standard(self, df: DataFrame) -> DataFrame:
         """
         將 Cola 原始欄位名稱重新命名為整併所需的標準欄位名稱。
@@ -205,8 +160,8 @@ class ColaTransformer(BaseTransformer):
         由第一段去回程起飛時間推導日期（MM/DD）與年份。
 
         作法：
-        - 以內部 `to_date_yyyy_slash_mm_slash_dd` 方法解析 `去程_出發時間1` 與 `回程_出發時間1`，
-          寫入 `出發日期` 與 `返回日期` 欄位，並設定 `出發年份` 與 `返回年份` 欄位。
+        - 以 `parsers.parse_dates` 向量化解析 `去程_出發時間1` 與 `回程_出發時間1`（偵測主要格式後整欄一次解析），
+          寫入 `出發日期` 與 `返回日期` 欄位（MM/DD，無法解析時為空字串），並設定 `出發年份` 與 `返回年份` 欄位（YYYY，無法解析時為空值）。
 
         參數：
         - df：包含 `去程_出發時間1`、`回程_出發時間1` 的 DataFrame。
@@ -217,16 +172,13 @@ class ColaTransformer(BaseTransformer):
         注意：
         - 此處設定年分的原因是因為在 unified_transformer 的最後一步中，會將 `出發日期` 與 `返回日期` 的年份設定為 `出發年份` 與 `返回年份`。
         """
-        dep_src = df['去程_出發時間1'] if '去程_出發時間1' in df.columns else None
-        ret_src = df['回程_出發時間1'] if '回程_出發時間1' in df.columns else None
-        if dep_src is not None:
-            df['出發日期'] = dep_src.apply(self.to_date_yyyy_slash_mm_slash_dd)
-            df['出發年份'] = dep_src.apply(lambda x: x.split('-')[0])
-            df['出發日期'] = df['出發日期'].str.slice(5,10).str.replace('-', '/')
-        if ret_src is not None:
-            df['返回日期'] = ret_src.apply(self.to_date_yyyy_slash_mm_slash_dd)
-            df['返回年份'] = ret_src.apply(lambda x: x.split('-')[0])
-            df['返回日期'] = df['返回日期'].str.slice(5,10).str.replace('-', '/')
+        for src_col, date_col, year_col in (('去程_出發時間1', '出發日期', '出發年份'),
+                                            ('回程_出發時間1', '返回日期', '返回年份')):
+            if src_col not in df.columns:
+                continue
+            parsed = parse_dates(df[src_col])
+            df[date_col] = format_dates(parsed, '%m/%d').fillna('')
+            df[year_col] = format_dates(parsed, '%Y')
         return df
 
     def _normalize_cabin_class(self, df: DataFrame) -> DataFrame:
@@ -246,26 +198,26 @@ class ColaTransformer(BaseTransformer):
 
     def _normalize_luggage(self, df: DataFrame) -> DataFrame:
         """
-        規整行李欄位字串：將數值與單位正規化並組回簡潔表示。
+        解析行李欄位為數值與單位兩欄。
 
         作法：
-        - 使用內部 `split_luggage` 方法解析每一個 `*行李{n}` 欄位的值為（數值, 單位）。
-        - 若可解析到數值，重寫為「<數值><單位>」（例如："1件"、"25公斤"），否則設為空字串。
+        - 以 `parse_luggage` 向量化解析每一個 `去程行李{n}`／`回程行李{n}` 欄位，
+          寫入 `去程行李數值{n}`（float）與 `去程行李單位{n}`（"件"/"公斤"/其他單位；無數值時為空字串），回程同理。
+        - 原始行李字串欄位解析後即移除。
 
         參數：
         - df：包含 `去程行李{n}`、`回程行李{n}` 欄位的 DataFrame。
 
         返回：
-        - DataFrame：行李欄位格式統一後的 DataFrame。
+        - DataFrame：以行李數值與單位欄位取代原始行李欄位後的 DataFrame。
         """
-        for col in list(df.columns):
-            if '行李' in col:
-                series = df[col]
-                # 若整欄皆為空，跳過處理
-                if series.isnull().all():
+        for leg in ('去程', '回程'):
+            for i in (1, 2, 3):
+                col = f'{leg}行李{i}'
+                if col not in df.columns:
                     continue
-                parsed = series.apply(lambda x: self.split_luggage(x))
-                df[col] = parsed.apply(lambda t: (f"{int(t[0]) if t[0] is not None and float(t[0]).is_integer() else t[0]}{t[1]}" if t[0] is not None and t[1] else (f"{t[0]}" if t[0] is not None else '')))
+                df[f'{leg}行李數值{i}'], df[f'{leg}行李單位{i}'] = parse_luggage(df[col])
+                df.drop(columns=[col], inplace=True)
         return df
 
     def _ensure_required_columns(self, df: DataFrame) -> DataFrame:
@@ -290,11 +242,11 @@ class ColaTransformer(BaseTransformer):
         """
         確保後續輸出所需的中繼欄位存在。
 
-        - `建立時間`：若無則以當前 epoch 秒補上
-        - `KP`：若無則以空字串補上
+        - `建立時間`：若無則以本次執行的時間（`run_timestamp`）補上
+        - `KP`：若無則以空值補上
         """
         if '建立時間' not in df.columns:
-            df['建立時間'] = time.time()
+            df['建立時間'] = self.run_timestamp
         if 'KP' not in df.columns:
-            df['KP'] = ''
+            df['KP'] = None
         return df
\ No newline at end of file
@@ -1,15 +1,16 @@
 # 外部庫
 from pandas import DataFrame
-import logging
 
 # 本地庫
-from etl.transform.base_transformer import BaseTransformer
+from etl.transform.base_transformer import BaseTransformer, SUPPLIER_SOURCE_COLUMNS
 
 class EztravelTransformer(BaseTransformer):
     """
     EztravelTransformer 類別負責處理特定的資料清洗邏輯。
     """
 
+    source_columns = SUPPLIER_SOURCE_COLUMNS + ['海外供應商']
+
     def clean_data(self, df: DataFrame) -> DataFrame:
         """
         清洗資料的主要方法。
@@ -23,6 +24,7 @@ class EztravelTransformer(BaseTransformer):
         df = self.rename_columns_to_chinese(df)
         df = self._handle_flight_number(df)
         df = self._handle_date(df)
+        df = self._normalize_join_keys(df)
         return df
 
     def rename_columns_to_chinese(self, df: DataFrame) -> DataFrame:
@@ -58,43 +60,6 @@ class EztravelTransformer(BaseTransformer):
         df.rename(columns=rename_columns, inplace=True)
         return df 
     
-    def _handle_flight_number(self, df: DataFrame) -> DataFrame:
-        """
-        處理航班編號資料。
-        """
-        logger = logging.getLogger(__name__)
-        candidate_cols = [
-            *[f'去程_航班編號{i}' for i in range(1, 4)],
-            *[f'回程_航班編號{i}' for i in range(1, 4)],
-        ]
-        flight_cols = [c for c in candidate_cols if c in df.columns]
-
-        if not flight_cols:
-            return df
-
-        for col in flight_cols:
-            s = df[col].fillna("").astype(str)
-            s = s.str.strip().str.replace(r"\s+", "", regex=True).str.upper()
-            s = s.str.replace(r"^([A-Z0-9]{2})(\d{2})$", r"\g<1>0\g<2>", regex=True)
-            s = s.str.replace(r"^([A-Z0-9]{2})(\d{1})$", r"\g<1>00\g<2>", regex=True)
-            df[col] = s
-
-        invalid_row_mask = None
-        for col in flight_cols:
-            s = df[col].fillna("").astype(str)
-            non_empty = s != ""
-            valid_fmt = s.str.match(r"^[A-Z0-9]{2}\d{3,4}$", na=False)
-            invalid_col_mask = non_empty & (~valid_fmt)
-            invalid_row_mask = invalid_col_mask if invalid_row_mask is None else (invalid_row_mask | invalid_col_mask)
-
-        if invalid_row_mask is not None and invalid_row_mask.any():
-            for idx in df.index[invalid_row_mask]:
-                offending = {col: df.at[idx, col] for col in flight_cols if isinstance(df.at[idx, col], str) and df.at[idx, col]}
-                logger.warning("移除無效航班編號資料 idx=%s 欄位=%s", idx, offending)
-            df = df[~invalid_row_mask]
-
-        return df
-
     def _handle_date(self, df: DataFrame) -> DataFrame:
         """
         處理日期資料。
@@ -0,0 +1,93 @@
+# 外部庫
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+def row_fingerprint(df: DataFrame, columns: Optional[List[str]] = None) -> np.ndarray:
+    """
+    簡單描述
+    計算每一列在指定欄位上的 64 位元指紋（各欄位雜湊後依欄位順序合併），可作為多欄位鍵的精簡替代。
+
+    作法：
+    - 以 `pd.util.hash_pandas_object` 逐欄雜湊（不含索引），一次合併為單一 uint64。
+    - 相同值得到相同指紋；不同值碰撞的機率約為 n² / 2⁶⁵，千萬筆內可忽略。
+    - 空值（None / NaN / NA）彼此視為相同。
+
+    參數：
+    - df：資料表。
+    - columns：參與計算的欄位，依此順序合併；None 代表全部欄位。
+
+    返回：
+    - np.ndarray：長度與 df 相同的 uint64 陣列。
+    """
+    frame = df if columns is None else df[list(columns)]
+    if frame.shape[1] == 0:
+        return np.zeros(len(frame), dtype='uint64')
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype='uint64')
+
+
+def drop_duplicate_rows(df: DataFrame, time_column: str) -> DataFrame:
+    """
+    簡單描述
+    移除除時間欄位外完全相同的重複列，每組只保留時間最新的一筆（不對整個資料表排序）。
+
+    作法：
+    - 以 `row_fingerprint` 將時間欄位以外的欄位合併為單一 uint64，取代逐欄比對。
+    - 依指紋分組取時間最大值（groupby max），保留各組第一筆等於最大值的列；整組時間皆為空值時保留第一筆。
+    - 保留的列維持原本的相對順序。
+
+    參數：
+    - df：資料表。
+    - time_column：判斷新舊的時間欄位（不參與指紋計算）。
+
+    返回：
+    - DataFrame：去重後的資料表；沒有重複時直接回傳原資料表。
+    """
+    if df.empty:
+        return df
+    return _keep_newest(df, row_fingerprint(df, [column for column in df.columns if column != time_column]), time_column)
+
+
+def key_set_fingerprints(df: DataFrame, key_columns: List[str], value_columns: List[str]) -> Tuple[np.ndarray, DataFrame]:
+    """
+    簡單描述
+    依業務鍵分組，為每個業務鍵計算一個涵蓋該鍵所有資料列的指紋；業務鍵重複時不捨棄任何一列。
+
+    作法：
+    - 以 `row_fingerprint` 分別計算每列的業務鍵指紋與資料指紋（`value_columns`）。
+    - 同一業務鍵各列的資料指紋以 uint64 相加（溢位循環）：與列的順序無關，但新增、刪除或修改任一列（含重複列的筆數）皆會改變結果。
+
+    參數：
+    - df：資料表。
+    - key_columns：業務鍵欄位。
+    - value_columns：參與資料指紋計算的欄位。
+
+    返回：
+    - np.ndarray：每列的業務鍵指紋（uint64，長度與 df 相同）。
+    - DataFrame：每個業務鍵一筆，欄位為 row_key、row_fingerprint（uint64）與 position（該鍵第一列在 df 中的位置），依第一次出現的順序排列。
+    """
+    keys = row_fingerprint(df, key_columns)
+    values = row_fingerprint(df, value_columns)
+    codes, unique_keys = pd.factorize(keys)
+    combined = np.zeros(len(unique_keys), dtype='uint64')
+    np.add.at(combined, codes, values)
+    positions = np.flatnonzero(~pd.Series(codes).duplicated().to_numpy())
+    return keys, pd.DataFrame({'row_key': np.asarray(unique_keys, dtype='uint64'), 'row_fingerprint': combined,
+                               'position': positions})
+
+
+def _keep_newest(df: DataFrame, fingerprints: np.ndarray, time_column: str) -> DataFrame:
+    """
+    每個指紋保留第一筆時間等於該組最大值的列（整組皆為空值時保留第一筆），維持原本的相對順序。
+    """
+    keys = pd.Series(fingerprints)
+    times = df[time_column].reset_index(drop=True)
+    newest = times.groupby(keys.to_numpy()).transform('max')
+    candidates = np.flatnonzero(((times == newest) | newest.isna()).to_numpy())
+    kept = candidates[~keys.iloc[candidates].duplicated().to_numpy()]
+    if len(kept) == len(df):
+        return df
+    return df.iloc[kept]
@@ -0,0 +1,152 @@
+# 外部庫
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# 本地庫
+from etl.transform.fingerprint import row_fingerprint
+
+
+class SupplierJoinEngine:
+    """
+    SupplierJoinEngine 以單一 64 位元複合鍵將多個供應商的欄位附加到主表（Cola），結果等同依序 left merge。
+
+    作法：
+    - 主表與各供應商的 join 鍵各只計算一次 `row_fingerprint`，之後只比對 uint64，不再重複雜湊字串鍵欄位。
+    - 每個供應商以 factorize 建立「鍵 -> 列位置」索引，對主表做一次 `get_indexer` 查找，只取需要的欄位。
+    - 供應商鍵唯一時直接以位置 take（主表列數不變）；有重複鍵時依 left merge 的語意展開（保留主表順序，
+      同一主表列的多筆配對依供應商原始順序），因此結果與逐一 merge 相同。
+    - 所有欄位最後一次組成 DataFrame，總成本隨供應商數量線性成長。
+
+    屬性：
+        key_columns (List[str]): join 鍵欄位。
+        fan_out (Dict[str, float]): 最近一次 `attach` 各供應商造成的列數放大倍率（1.0 代表未展開）。
+    """
+
+    def __init__(self, key_columns: List[str]):
+        """
+        初始化 SupplierJoinEngine。
+
+        參數：
+            key_columns (List[str]): join 鍵欄位（主表與各供應商皆須具備）。
+        """
+        self.key_columns = list(key_columns)
+        self.fan_out = {}
+
+    def attach(self, base: DataFrame, suppliers: List[Tuple[str, DataFrame, List[str]]]) -> DataFrame:
+        """
+        將各供應商的指定欄位附加到主表。
+
+        參數：
+            base (DataFrame): 主表（左表）。
+            suppliers (List[Tuple[str, DataFrame, List[str]]]): 依序為（供應商名稱, 供應商資料, 要附加的欄位）；
+                供應商資料缺少的欄位以空值補齊。
+
+        返回：
+            DataFrame: 主表欄位加上各供應商欄位，索引自 0 重新編號。
+
+        例外：
+            ValueError: 要附加的欄位與主表或其他供應商的欄位重名時拋出。
+        """
+        # 目前每一列對應的主表列位置與 join 鍵指紋；有重複鍵展開時兩者一起展開
+        base_rows = np.arange(len(base))
+        keys = row_fingerprint(base, self.key_columns)
+        attached = {}
+        self.fan_out = {}
+
+        for name, supplier, value_columns in suppliers:
+            duplicated = [column for column in value_columns if column in base.columns or column in attached]
+            if duplicated:
+                raise ValueError(f"供應商 {name} 的欄位與既有欄位重名：{duplicated}")
+
+            rows_before = len(keys)
+            supplier_rows, expansion = self._lookup(keys, row_fingerprint(supplier, self.key_columns))
+            if expansion is not None:
+                base_rows = base_rows[expansion]
+                keys = keys[expansion]
+                attached = {column: values[expansion] for column, values in attached.items()}
+            self.fan_out[name] = len(keys) / rows_before if rows_before else 1.0
+
+            for column in value_columns:
+                if column in supplier.columns:
+                    attached[column] = self._take(supplier[column], supplier_rows)
+                else:
+                    attached[column] = np.full(len(keys), np.nan)
+
+        if len(base_rows) == len(base):
+            # 未展開：直接沿用主表欄位，不複製
+            columns = {column: base[column].array for column in base.columns}
+        else:
+            columns = {column: base[column].array.take(base_rows) for column in base.columns}
+        columns.update(attached)
+        return DataFrame(columns, index=pd.RangeIndex(len(base_rows)), copy=False)
+
+    def reduce(self, supplier: DataFrame, ranks: Optional[List[np.ndarray]] = None) -> DataFrame:
+        """
+        每個 join 鍵只保留一筆，使之後的 `attach` 不會展開主表。
+
+        作法：
+        - 依 `ranks` 排序（第一個陣列為主要排序鍵，數值小者優先、NaN 排最後；同值維持原始順序），
+          各鍵保留排序後的第一筆；未提供 `ranks` 時保留原始順序的第一筆。
+        - 保留的列維持原始相對順序；沒有重複鍵時直接回傳原資料框。
+
+        參數：
+            supplier (DataFrame): 供應商資料（須具備 join 鍵欄位）。
+            ranks (Optional[List[np.ndarray]]): 與供應商列數等長的排序鍵，依優先順序排列。
+
+        返回：
+            DataFrame: 每個 join 鍵至多一筆的供應商資料。
+        """
+        keys = row_fingerprint(supplier, self.key_columns)
+        if len(pd.unique(keys)) == len(keys):
+            return supplier
+        # np.lexsort 以最後一個鍵為主要排序鍵，且為穩定排序
+        order = np.lexsort(tuple(reversed(ranks))) if ranks else np.arange(len(keys))
+        first = ~pd.Series(keys[order]).duplicated().to_numpy()
+        return supplier.iloc[np.sort(order[first])]
+
+    @staticmethod
+    def _take(series: pd.Series, positions: np.ndarray):
+        """
+        依位置取值，位置 -1 填入空值（整數欄位與 merge 相同轉為浮點數）。
+        """
+        if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            return series.array.take(positions, allow_fill=True)
+        return pd.api.extensions.take(series.to_numpy(), positions, allow_fill=True)
+
+    @staticmethod
+    def _lookup(keys: np.ndarray, supplier_keys: np.ndarray):
+        """
+        以指紋查找每一列在供應商中的配對列。
+
+        參數：
+            keys (np.ndarray): 目前各列的 join 鍵指紋。
+            supplier_keys (np.ndarray): 供應商各列的 join 鍵指紋。
+
+        返回：
+            Tuple[np.ndarray, Optional[np.ndarray]]: （每一列配對到的供應商列位置，無配對為 -1；
+            有重複鍵時目前各列的展開位置，否則為 None）。
+        """
+        supplier_codes, unique_keys = pd.factorize(supplier_keys)
+        codes = pd.Index(unique_keys).get_indexer(keys)
+        if len(unique_keys) == len(supplier_keys):
+            # 鍵唯一：factorize 代碼即為列位置
+            return codes, None
+
+        # 重複鍵：依鍵分組（穩定排序保留供應商原始順序），每一列展開為其配對筆數（無配對保留一列）
+        order = np.argsort(supplier_codes, kind='stable')
+        group_sizes = np.bincount(supplier_codes, minlength=len(unique_keys))
+        group_starts = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+        matches = np.where(codes >= 0, group_sizes[codes], 0)
+        repeats = np.maximum(matches, 1)
+        expansion = np.repeat(np.arange(len(keys)), repeats)
+        offsets = np.arange(len(expansion)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        expanded_codes = codes[expansion]
+        supplier_rows = np.where(
+            expanded_codes >= 0,
+            order[group_starts[np.maximum(expanded_codes, 0)] + offsets],
+            -1,
+        )
+        return supplier_rows, expansion
@@ -0,0 +1,404 @@
+# 外部庫
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Optional, Tuple
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# 行李單位中代表公斤的寫法
+_KILOGRAM_PATTERN = r"公斤|kg|KG|Kg"
+
+
+def _as_string_series(values: pd.Series) -> pd.Series:
+    """
+    簡單描述
+    將任意型別的欄位轉為 object 字串欄位（保留空值），並去除前後空白，供 `.str` 向量化處理。
+
+    參數：
+    - values：原始欄位。
+
+    返回：
+    - Series：非空值皆為 `str` 的欄位；空值維持為空。
+    """
+    values = values.astype(object)
+    missing = values.isna()
+    strings = values.where(missing, values.astype(str))
+    return strings.str.strip()
+
+
+def parse_luggage(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    簡單描述
+    以向量化字串運算將行李欄位解析為數值與單位兩欄，單位正規化為「件」或「公斤」。
+
+    規則：
+    - 數值取第一段數字（可含小數）；無數字（如 "無"）或空值時數值為空、單位為空字串。
+    - 單位為移除數字、空白與小數點後的剩餘字串；含「件」者為「件」，否則含「公斤」/kg 者為「公斤」，其餘保留原字串。
+
+    參數：
+    - values：行李描述欄位，如 "1件"、"25 公斤"、"2 PC"。
+
+    返回：
+    - Tuple[Series, Series]：（float64 數值, 單位字串），索引與輸入相同。
+
+    範例：
+    - "1件" → (1.0, "件")
+    - "25 公斤" → (25.0, "公斤")
+    - "無" → (NaN, "")
+    """
+    # 行李描述的種類很少：只解析不重複值，再以代碼映射回每一列
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    strings = _as_string_series(pd.Series(uniques, dtype=object))
+    digits = strings.str.extract(r"(\d+(?:\.\d+)?)", expand=False)
+    number = pd.to_numeric(digits, errors='coerce').astype('float64')
+    # 全形等非 ASCII 數字 to_numeric 無法解析，改以 float() 處理
+    leftover = digits.notna() & number.isna()
+    if leftover.any():
+        number[leftover] = digits[leftover].map(float)
+
+    unit = strings.str.replace(r"[\d\s\.]+", "", regex=True)
+    is_piece = unit.str.contains("件", regex=False, na=False).astype(bool)
+    is_kilogram = unit.str.contains(_KILOGRAM_PATTERN, regex=True, na=False).astype(bool) & ~is_piece
+    unit = unit.mask(is_piece, "件").mask(is_kilogram, "公斤")
+    unit = unit.where(number.notna(), "")
+
+    # 代碼 -1（空值）對應到附加在最後的 (NaN, "")
+    number = np.append(number.to_numpy(dtype='float64'), np.nan)[codes]
+    unit = np.append(unit.to_numpy(dtype=object), "")[codes]
+    return pd.Series(number, index=values.index), pd.Series(unit, index=values.index, dtype=object)
+
+
+# Cola 日期時間欄位可能出現的格式（依 `ColaTransformer` 既有規則）
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%Y/%m/%d %H:%M", "%Y/%m/%d")
+
+# 偵測主要格式時取樣的不重複值數量
+_FORMAT_SAMPLE_SIZE = 1000
+
+
+def _rank_formats(strings: pd.Series, formats: Tuple[str, ...]) -> list:
+    """
+    簡單描述
+    以樣本偵測各格式可解析的比例，依可解析筆數由多到少排序（主要格式排在最前）。
+
+    參數：
+    - strings：不重複的非空日期字串。
+    - formats：候選格式。
+
+    返回：
+    - list：排序後的格式；樣本中完全無法解析的格式排在最後。
+    """
+    sample = strings.iloc[:_FORMAT_SAMPLE_SIZE]
+    hits = {fmt: int(pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()) for fmt in formats}
+    return sorted(formats, key=lambda fmt: -hits[fmt])
+
+
+def _parse_timestamp(value: str):
+    """
+    簡單描述
+    逐值備援解析：交給 `pd.to_datetime` 推斷格式，帶時區者保留當地時間並移除時區。
+    """
+    try:
+        parsed = pd.to_datetime(value, errors='coerce')
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    if pd.isna(parsed):
+        return pd.NaT
+    return parsed.tz_localize(None) if parsed.tzinfo is not None else parsed
+
+
+def parse_dates(values: pd.Series, formats: Tuple[str, ...] = DATE_FORMATS) -> pd.Series:
+    """
+    簡單描述
+    向量化解析多種格式的日期時間字串。
+
+    作法：
+    - 只處理不重複值：先以樣本偵測主要格式，整欄以該格式一次解析。
+    - 剩餘未解析者依序嘗試其他格式，最後才逐值交給 `pd.to_datetime` 推斷（僅限剩餘的少數值）。
+    - 已是 datetime 型別的欄位直接返回（移除時區）。
+
+    參數：
+    - values：日期或日期時間欄位，如 "2025-11-05 19:20:00"、"2025/11/05"。
+    - formats：候選格式，預設為 `DATE_FORMATS`。
+
+    返回：
+    - Series：datetime64 欄位（不含時區），索引與輸入相同；空值或無法解析者為 NaT。
+
+    範例：
+    - "2025-11-05 19:20:00" → Timestamp("2025-11-05 19:20:00")
+    - "2025/11/05" → Timestamp("2025-11-05")
+    - "無" → NaT
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.dt.tz_localize(None) if values.dt.tz is not None else values
+
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    strings = _as_string_series(pd.Series(uniques, dtype=object))
+    strings = strings.where(strings != "")
+    parsed = pd.Series(pd.NaT, index=strings.index, dtype='datetime64[ns]')
+
+    pending = strings.notna()
+    if pending.any():
+        for fmt in _rank_formats(strings[pending], formats):
+            attempt = pd.to_datetime(strings[pending], format=fmt, errors='coerce')
+            parsed[attempt.index] = attempt
+            pending &= parsed.isna()
+            if not pending.any():
+                break
+    if pending.any():
+        parsed[pending] = strings[pending].map(_parse_timestamp).astype('datetime64[ns]')
+
+    # 代碼 -1（空值）對應到附加在最後的 NaT
+    result = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))[codes]
+    return pd.Series(result, index=values.index)
+
+
+def format_dates(values: pd.Series, date_format: str) -> pd.Series:
+    """
+    簡單描述
+    將 datetime 欄位格式化為字串；只格式化不重複值，再以代碼映射回每一列。
+
+    參數：
+    - values：datetime64 欄位。
+    - date_format：`strftime` 格式，如 "%m/%d"。
+
+    返回：
+    - Series：object 字串欄位，索引與輸入相同；NaT 為空值。
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    formatted = pd.DatetimeIndex(uniques).strftime(date_format).to_numpy(dtype=object)
+    result = np.append(formatted, np.nan)[codes]
+    return pd.Series(result, index=values.index, dtype=object)
+
+
+# 純量解析結果的 LRU 快取大小（各解析函式各自一份，跨欄位與跨次執行共用）
+PARSER_CACHE_SIZE = 65536
+
+
+def memoize(func: Callable[[Any], Any], maxsize: int = PARSER_CACHE_SIZE) -> Callable[[Any], Any]:
+    """
+    簡單描述
+    以有上限的 LRU 快取包裝純量解析函式（區分型別，例如 95 與 "95" 分開快取）。
+
+    參數：
+    - func：只依輸入值決定輸出的純量函式。
+    - maxsize：快取上限筆數。
+
+    返回：
+    - Callable：帶快取的函式；可用 `cache_info()` 查看命中率。
+    """
+    return lru_cache(maxsize=maxsize, typed=True)(func)
+
+
+def apply_unique(values: pd.Series, func: Callable[[Any], Any]) -> pd.Series:
+    """
+    簡單描述
+    等同 `values.apply(func)`，但只對不重複值呼叫 `func`：先 factorize，再以代碼 take 映射回每一列。
+
+    適用於低基數欄位（航班編號、時間、飛行時間等）；搭配 `memoize` 時不同欄位與不同次執行的相同值也只解析一次。
+    空值一律以 `func(None)` 的結果填入。
+
+    參數：
+    - values：要解析的欄位。
+    - func：純量解析函式。
+
+    返回：
+    - Series：解析結果，索引與輸入相同，dtype 推斷方式與 `apply` 相同。
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    results = np.empty(len(uniques) + 1, dtype=object)
+    results[:-1] = [func(value) for value in uniques]
+    # 代碼 -1（空值）對應到最後一格
+    results[-1] = func(None)
+    return pd.Series(results[codes], index=values.index, dtype=object).infer_objects()
+
+
+def extract_airline_code(flight_number: Optional[str]) -> str:
+    """
+    簡單描述
+    從航班編號字串擷取航空公司兩到三碼（前綴英文字母）。
+
+    參數：
+    - flight_number：航班編號，如 "HX261"、"CI073"。
+
+    返回：
+    - str：航空公司代碼（大寫），若無法解析則回傳空字串。
+
+    範例：
+    - 輸入："HX261" → 輸出："HX"
+    - 輸入：None → 輸出：""
+    """
+    if not isinstance(flight_number, str) or not flight_number:
+        return ""
+    m = re.match(r"([A-Za-z]+)", flight_number)
+    return m.group(1).upper() if m else ""
+
+
+def to_time_hhmm(value: Optional[str]) -> str:
+    """
+    簡單描述
+    將時間字串正規化為 HH:MM（24 小時制）。支援完整日期時間（YYYY-MM-DD HH:MM:SS）、YYYY/MM/DD HH:MM、HH:MM，以及內文帶有 HH:MM 的情況。
+
+    參數：
+    - value：時間字串，如 "2025-11-05 19:20:00" 或 "19:20"。
+
+    返回：
+    - str：正規化後的 "HH:MM"；若無法解析則回傳空字串。
+
+    範例：
+    - 輸入："2025-11-05 19:20:00" → 輸出："19:20"
+    - 輸入："0 days 19:20:00" → 輸出："19:20"
+    - 輸入："19:05" → 輸出："19:05"
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if not isinstance(value, str):
+        value = str(value)
+    value = value.strip()
+    if not value:
+        return ""
+    # Try full datetime
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d %H:%M"):
+        try:
+            dt = datetime.strptime(value, fmt)
+            return dt.strftime("%H:%M")
+        except Exception:
+            pass
+    # Already HH:MM
+    m = re.match(r"^(\d{1,2}):(\d{2})$", value)
+    if m:
+        hh = int(m.group(1))
+        mm = int(m.group(2))
+        return f"{hh:02d}:{mm:02d}"
+    # Other formats -> best effort: keep tail HH:MM if found
+    m = re.search(r"(\d{1,2}:\d{2})", value)
+    if m:
+        hh, mm = m.group(1).split(":")
+        return f"{int(hh):02d}:{int(mm):02d}"
+    return ""
+
+
+def duration_to_minutes(value: Optional[str]) -> Optional[int]:
+    """
+    簡單描述
+    將飛行時間字串轉為總分鐘數。支援格式如 "0 days 02:05:00"、"02:05:00"，或純數字（視為分鐘）。
+
+    參數：
+    - value：持續時間字串或數值。
+
+    返回：
+    - Optional[int]：總分鐘數；若無法解析則回傳 None。
+
+    範例：
+    - 輸入："0 days 02:05:00" → 輸出：125
+    - 輸入："01:30:30" → 輸出：91（四捨五入秒數）
+    - 輸入："95" → 輸出：95
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if not isinstance(value, str):
+        value = str(value)
+    value = value.strip()
+    if not value:
+        return None
+    # Patterns like "0 days 02:05:00" or "02:05:00"
+    m = re.search(r"(?:(\d+)\s*days\s*)?(\d{1,2}):(\d{2})(?::(\d{2}))?", value)
+    if m:
+        days = int(m.group(1)) if m.group(1) else 0
+        hours = int(m.group(2))
+        minutes = int(m.group(3))
+        seconds = int(m.group(4)) if m.group(4) else 0
+        total = days * 24 * 60 + hours * 60 + minutes + (1 if seconds >= 30 else 0)
+        return total
+    # Fallback: numbers-only assume minutes
+    if re.match(r"^\d+$", value):
+        return int(value)
+    return None
+
+
+cached_extract_airline_code = memoize(extract_airline_code)
+cached_to_time_hhmm = memoize(to_time_hhmm)
+cached_duration_to_minutes = memoize(duration_to_minutes)
+
+
+def first_token(value: Optional[str]):
+    """
+    簡單描述
+    取以空白分隔的第一個字（例如機場欄位 "TPE 桃園" → "TPE"）。
+
+    參數：
+    - value：任意值；空值視為空字串。
+
+    返回：
+    - str 或 NaN：第一個字；沒有任何字時為 NaN。
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        value = ''
+    tokens = str(value).split()
+    return tokens[0] if tokens else np.nan
+
+
+cached_first_token = memoize(first_token)
+
+
+# join 鍵中視為空值的字面值（比對前先轉小寫）
+_JOIN_KEY_PLACEHOLDERS = {"", "nan", "none", "<na>", "null", "nat"}
+
+
+def canonical_join_key(value: Any, compact: bool = True) -> str:
+    """
+    簡單描述
+    將單一 join 鍵值正規化：空值與字面上的 "nan"/"None"/"<NA>"/"null"/"NaT" 視為空字串，
+    去除前後空白、合併多餘空白並轉為大寫；`compact` 時再移除所有空白（航班編號 'CX 450' -> 'CX450'、艙等 '經濟艙 K' -> '經濟艙K'）。
+
+    參數：
+    - value：任意值；空值以 `str()` 後的字面值判斷（與 `astype(str)` 相同）。
+    - compact：是否移除所有空白。
+
+    返回：
+    - str：正規化後的鍵值。
+    """
+    text = re.sub(r"\s+", " ", str(value).strip())
+    if text.lower() in _JOIN_KEY_PLACEHOLDERS:
+        return ''
+    text = text.upper()
+    return re.sub(r"\s+", "", text) if compact else text
+
+
+def canonical_join_date(value: Any) -> str:
+    """
+    簡單描述
+    將 join 用的日期鍵正規化為 MM/DD：'.'、'-' 改為 '/'，去除前綴或尾綴的四位數年份，M/D 補零為 MM/DD；
+    其他無法辨識的值維持 `canonical_join_key(value, compact=False)` 的結果。
+
+    參數：
+    - value：日期值，如 "11/05"、"2025-11-05"、"5/1"。
+
+    返回：
+    - str：MM/DD 或原樣（已正規化空白與大小寫）的字串。
+
+    範例：
+    - "2025-11-05" → "11/05"
+    - "5/1" → "05/01"
+    """
+    text = canonical_join_key(value, compact=False)
+    text = text.replace('.', '/').replace('-', '/').strip()
+    text = re.sub(r'^\s*\d{4}\s*/', '', text)
+    text = re.sub(r'/\s*\d{4}\s*$', '', text)
+    match = re.match(r'^\s*(\d{1,2})\s*/\s*(\d{1,2})\s*$', text)
+    if match:
+        padded = f"{int(match.group(1)):02d}/{int(match.group(2)):02d}"
+        try:
+            # 可解析為月日者統一輸出 MM/DD；無效日期（如 02/30）維持補零後的字串
+            return datetime.strptime(padded, '%m/%d').strftime('%m/%d')
+        except ValueError:
+            return padded
+    return text
+
+
+cached_canonical_join_key = memoize(canonical_join_key)
+cached_canonical_join_date = memoize(canonical_join_date)
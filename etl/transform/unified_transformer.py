@@ -1,150 +1,114 @@
+import logging
 import pandas as pd
 from pandas import DataFrame
 import numpy as np
-import re
-import math
-from datetime import datetime
-from typing import Optional, Tuple
+from typing import List, Optional
+
+from etl.schema import coerce_to_schema
+from etl.transform.parsers import (
+    apply_unique,
+    cached_duration_to_minutes,
+    cached_extract_airline_code,
+    cached_first_token,
+    cached_to_time_hhmm,
+    duration_to_minutes,
+    extract_airline_code,
+    parse_luggage,
+    to_time_hhmm,
+)
+from etl.transform.base_transformer import JOIN_KEY_COLUMNS, JOIN_KEYS_NORMALIZED, normalize_join_keys
+from etl.transform.join_engine import SupplierJoinEngine
+
+# join 前供應商資料的縮減方式（每個 join 鍵只保留一筆）：
+# "latest" 保留最新爬取者、"min_price" 保留票價最低者（同價取最新）、"none" 不縮減（重複鍵會展開 Cola 列）
+SUPPLIER_REDUCTIONS = ('latest', 'min_price', 'none')
+
+# 供應商資料的爬取時間欄位
+SUPPLIER_CRAWL_TIME_COLUMN = 'crawl_time'
+
 class UnifiedTransformer:
     """
     UnifiedTransformer 類負責整合來自各個 Transformer 的清洗結果，並進行最後的欄位對齊、join 價格稅金等。
+
+    屬性：
+        supplier_reduction (str): join 前供應商資料的縮減方式，見 `SUPPLIER_REDUCTIONS`。
+        join_fan_out (Dict[str, float]): 最近一次 join 各供應商造成的列數放大倍率（1.0 代表未展開）。
+        supplier_rows_reduced (Dict[str, int]): 最近一次 join 前各供應商因縮減而略過的筆數。
     """
+
+    # 輸出欄位 -> 各供應商的票價、稅金與稅金加價成數欄位
+    SUPPLIER_COLUMNS = {
+        'ezfly':                     {'price': 'ezfly_ticket_price',
+                                      'tax': 'ezfly_tax',
+                                      'tax_markup_percentage': 'ezfly_tax_markup_percentage'},
+        'eztravel':                  {'price': 'eztravel_ticket_air_tickets_price',
+                                      'tax': 'eztravel_tax',
+                                      'tax_markup_percentage': 'eztravel_tax_markup_percentage'},
+        'foreign_supplier_eztravel': {'price': 'foreign_supplier_eztraval_ticket_air_tickets_price',
+                                      'tax': 'foreign_supplier_eztraval_tax',
+                                      'tax_markup_percentage': 'foreign_supplier_eztraval_tax_markup_percentage'},
+        'lion':                      {'price': 'lion_air_tickets_price',
+                                      'tax': 'lion_tax',
+                                      'tax_markup_percentage': 'lion_tax_markup_percentage'},
+        'settour':                   {'price': 'settour_air_tickets_price',
+                                      'tax': 'settour_tax',
+                                      'tax_markup_percentage': 'settour_tax_markup_percentage'},
+        'rich':                      {'price': 'rich_mond_air_tickets_price',
+                                      'tax': 'rich_mond_tax',
+                                      'tax_markup_percentage': 'rich_mond_tax_markup_percentage'}
+    }
+
+    # 直接沿用的欄位（輸出欄位, 來源欄位），依輸出順序排列
+    PASSTHROUGH_COLUMNS = [
+        ('gds_type', 'GDS_Type'),
+        ('ticket_price', '機票價錢'),
+        ('ticket_price_markup_percentage', '機票價錢加價成數'),
+        ('tax', '稅金'),
+        ('tax_markup_percentage', '稅金加價成數'),
+        ('final_price', '最終價格'),
+        ('departure_date', '出發日期'),
+        ('return_date', '返回日期'),
+        ('creation_time', '建立時間'),
+    ]
+    TRAILING_COLUMNS = [
+        ('net_price_or_ticket_price', '淨價或票面'),
+        ('ticket_rule_type', '票價規則類型'),
+        ('kp', 'KP'),
+        ('discount', '折扣'),
+        ('activity_fee_adjustment', '固定金額'),
+    ]
     
-    def extract_airline_code(self, flight_number: Optional[str]) -> str:
+    def __init__(self, supplier_reduction: str = 'none'):
         """
-        簡單描述
-        從航班編號字串擷取航空公司兩到三碼（前綴英文字母）。
+        初始化 UnifiedTransformer。
 
         參數：
-        - flight_number：航班編號，如 "HX261"、"CI073"。
-
-        返回：
-        - str：航空公司代碼（大寫），若無法解析則回傳空字串。
+        - supplier_reduction：join 前供應商資料的縮減方式（"latest"、"min_price" 或 "none"）。
+        """
+        if supplier_reduction not in SUPPLIER_REDUCTIONS:
+            raise ValueError(f"supplier_reduction 須為 {SUPPLIER_REDUCTIONS} 之一：{supplier_reduction}")
+        self.supplier_reduction = supplier_reduction
+        self.join_fan_out = {}
+        self.supplier_rows_reduced = {}
+        self.logger = logging.getLogger(__name__)
 
-        範例：
-        - 輸入："HX261" → 輸出："HX"
-        - 輸入：None → 輸出：""
+    def extract_airline_code(self, flight_number: Optional[str]) -> str:
+        """
+        從航班編號字串擷取航空公司代碼，見 `parsers.extract_airline_code`。
         """
-        if not isinstance(flight_number, str) or not flight_number:
-            return ""
-        m = re.match(r"([A-Za-z]+)", flight_number)
-        return m.group(1).upper() if m else ""
+        return extract_airline_code(flight_number)
 
     def to_time_hhmm(self, value: Optional[str]) -> str:
         """
-        簡單描述
-        將時間字串正規化為 HH:MM（24 小時制）。支援完整日期時間（YYYY-MM-DD HH:MM:SS）、YYYY/MM/DD HH:MM、HH:MM，以及內文帶有 HH:MM 的情況。
-
-        參數：
-        - value：時間字串，如 "2025-11-05 19:20:00" 或 "19:20"。
-
-        返回：
-        - str：正規化後的 "HH:MM"；若無法解析則回傳空字串。
-
-        範例：
-        - 輸入："2025-11-05 19:20:00" → 輸出："19:20"
-        - 輸入："0 days 19:20:00" → 輸出："19:20"
-        - 輸入："19:05" → 輸出："19:05"
-        """
-        if value is None or (isinstance(value, float) and math.isnan(value)):
-            return ""
-        if not isinstance(value, str):
-            value = str(value)
-        value = value.strip()
-        if not value:
-            return ""
-        # Try full datetime
-        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d %H:%M"):
-            try:
-                dt = datetime.strptime(value, fmt)
-                return dt.strftime("%H:%M")
-            except Exception:
-                pass
-        # Already HH:MM
-        m = re.match(r"^(\d{1,2}):(\d{2})$", value)
-        if m:
-            hh = int(m.group(1))
-            mm = int(m.group(2))
-            return f"{hh:02d}:{mm:02d}"
-        # Other formats -> best effort: keep tail HH:MM if found
-        m = re.search(r"(\d{1,2}:\d{2})", value)
-        if m:
-            hh, mm = m.group(1).split(":")
-            return f"{int(hh):02d}:{int(mm):02d}"
-        return ""
+        將時間字串正規化為 HH:MM，見 `parsers.to_time_hhmm`。
+        """
+        return to_time_hhmm(value)
 
     def duration_to_minutes(self, value: Optional[str]) -> Optional[int]:
         """
-        簡單描述
-        將飛行時間字串轉為總分鐘數。支援格式如 "0 days 02:05:00"、"02:05:00"，或純數字（視為分鐘）。
-
-        參數：
-        - value：持續時間字串或數值。
-
-        返回：
-        - Optional[int]：總分鐘數；若無法解析則回傳 None。
-
-        範例：
-        - 輸入："0 days 02:05:00" → 輸出：125
-        - 輸入："01:30:30" → 輸出：91（四捨五入秒數）
-        - 輸入："95" → 輸出：95
-        """
-        if value is None or (isinstance(value, float) and math.isnan(value)):
-            return None
-        if isinstance(value, (int, float)) and not isinstance(value, bool):
-            return int(value)
-        if not isinstance(value, str):
-            value = str(value)
-        value = value.strip()
-        if not value:
-            return None
-        # Patterns like "0 days 02:05:00" or "02:05:00"
-        m = re.search(r"(?:(\d+)\s*days\s*)?(\d{1,2}):(\d{2})(?::(\d{2}))?", value)
-        if m:
-            days = int(m.group(1)) if m.group(1) else 0
-            hours = int(m.group(2))
-            minutes = int(m.group(3))
-            seconds = int(m.group(4)) if m.group(4) else 0
-            total = days * 24 * 60 + hours * 60 + minutes + (1 if seconds >= 30 else 0)
-            return total
-        # Fallback: numbers-only assume minutes
-        if re.match(r"^\d+$", value):
-            return int(value)
-        return None
-
-    def split_luggage(self, value: Optional[str]) -> Tuple[Optional[float], str]:
-        """
-        簡單描述
-        解析行李欄位為（數值, 單位）。將單位正規化為「件」或「公斤」。
-
-        參數：
-        - value：行李描述，如 "1件"、"25 公斤"、"2 件"。
-
-        返回：
-        - Tuple[Optional[float], str]：數值（float 或 None）與單位（"件"/"公斤"/空字串）。
-
-        範例：
-        - 輸入："1件" → 輸出：(1.0, "件")
-        - 輸入："25 公斤" → 輸出：(25.0, "公斤")
-        - 輸入："無" → 輸出：(None, "")
-        """
-        if value is None or (isinstance(value, float) and math.isnan(value)):
-            return None, ""
-        if not isinstance(value, str):
-            value = str(value)
-        value = value.strip()
-        if not value:
-            return None, ""
-        # Examples: "1件", "25公斤", "30 公斤", "2 件"
-        num_match = re.search(r"(\d+(?:\.\d+)?)", value)
-        unit = re.sub(r"[\d\s\.]+", "", value)
-        number = float(num_match.group(1)) if num_match else None
-        # Normalize units to exactly hk4g4 uses: 件 / 公斤
-        if "件" in unit:
-            unit = "件"
-        elif any(u in unit for u in ["公斤", "kg", "KG", "Kg"]):
-            unit = "公斤"
-        return number, unit
+        將飛行時間字串轉為總分鐘數，見 `parsers.duration_to_minutes`。
+        """
+        return duration_to_minutes(value)
 
     def unify_data(self, cola_df: DataFrame, set_df: DataFrame, lion_df: DataFrame ,eztravel_df: DataFrame, foreign_supplier_eztravel_df: DataFrame, rich_df: DataFrame) -> DataFrame:
         """
@@ -153,6 +117,7 @@ class UnifiedTransformer:
         簡介：
         - 先以航班編號、艙等與去回程日期進行 join，彙整其他供應商的票價/稅金。
         - 再以 `unify_csv` 的轉換函式輸出最終欄位（時間、行李、航司代碼、飛行時間等）。
+        - 最後依 `etl.schema` 的欄位定義轉換型別（Arrow 字串、類別、可為空的整數）。
 
         參數：
         - cola_df：Cola 清洗後資料。
@@ -170,12 +135,18 @@ class UnifiedTransformer:
         unified_df = self._rename_columns(unified_df)
         unified_df = self._remove_no_tax_data(unified_df)
         unified_df = self._blank_strings_to_nan(unified_df)
+        unified_df = coerce_to_schema(unified_df)
         return unified_df
 
     def join_price_and_tax(self, cola_df: DataFrame, set_df: DataFrame, lion_df: DataFrame, eztravel_df: DataFrame, foreign_supplier_eztravel_df: DataFrame, rich_df: DataFrame) -> DataFrame:
         """
         將各供應商的票價與稅金資訊依航班/艙等/日期進行關聯。
 
+        作法：
+        - join 鍵正規化後，依 `supplier_reduction` 讓各供應商每個 join 鍵只保留一筆（見 `_reduce_suppliers`）。
+        - 交由 `SupplierJoinEngine` 以 64 位元複合鍵一次附加各供應商的票價與稅金欄位，
+          結果等同依序 left merge（未縮減且供應商有重複鍵時同樣展開）；各供應商的展開倍率記錄於 `join_fan_out`。
+
         參數：
         - cola_df：Cola 清洗後 DataFrame。
         - set_df：東南清洗後 DataFrame。
@@ -206,301 +177,222 @@ class UnifiedTransformer:
             if column not in rich_df.columns:
                 rich_df[column] = pd.NA
 
-        # 根據航班編號、艙等和日期進行 join，並使用 suffixes 區分可樂以外的欄位
-        join_keys = required_columns + ['出發日期', '返回日期']
+        # 根據航班編號、艙等和日期進行 join
+        join_keys = JOIN_KEY_COLUMNS
 
-        # 正規化函式：
-        # - 將缺值與字面上的 "nan"/"none"/"<na>"/"null"/"nat"/"nat"/"NaT" 視為空字串
-        # - 去除前後空白、合併多餘空白、轉為大寫
-        # - 日期欄位嘗試解析後統一輸出為 MM/DD（盡量對齊各來源的常見格式）
+        # 各 Transformer 的 clean_data 已於清洗階段正規化 join 鍵（`normalize_join_keys`，並以 attrs 標記），
+        # 此處直接使用、不再複製；未標記的資料框（如直接傳入的外部資料）才複製後正規化。
         def _normalize_df_for_join(df: DataFrame) -> DataFrame:
-            df = df.copy()
-            placeholders = {"", "nan", "none", "<na>", "null", "nat", "nat", "nat"}
-            flight_number_cols = [
-                *[f'去程_航班編號{i}' for i in range(1, 4)],
-                *[f'回程_航班編號{i}' for i in range(1, 4)],
-            ]
-            cabin_class_cols = [
-                *[f'去程_艙等{i}' for i in range(1, 4)],
-                *[f'回程_艙等{i}' for i in range(1, 4)],
-            ]
-            for col in join_keys:
-                if col not in df.columns:
-                    df[col] = pd.NA
-                s = df[col].astype(str)
-                s = s.str.strip()
-                s = s.str.replace(r"\s+", " ", regex=True)
-                sl = s.str.lower()
-                s = s.where(~sl.isin(placeholders), '')
-                # 將 'nat'/'nat'/'NaT' 等在大小寫轉換後也涵蓋
-                s = s.str.upper()
-                # 航班編號：移除內部空白，例如 'CX 450' -> 'CX450'
-                if col in flight_number_cols:
-                    s = s.str.replace(r"\s+", "", regex=True)
-                # 艙等：也移除內部空白，例如 '經濟艙 K' -> '經濟艙K'
-                if col in cabin_class_cols:
-                    s = s.str.replace(r"\s+", "", regex=True)
-                df[col] = s
-            # 日期特別處理：標準化為 MM/DD
-            for dcol in ['出發日期', '返回日期']:
-                if dcol in df.columns:
-                    s = df[dcol].astype(str)
-                    s = s.str.replace('.', '/', regex=False).str.replace('-', '/', regex=False).str.strip()
-                    # 去除前綴或尾綴的年份，僅保留月日
-                    s = s.str.replace(r'^\s*\d{4}\s*/', '', regex=True)
-                    s = s.str.replace(r'/\s*\d{4}\s*$', '', regex=True)
-                    # 將 M/D 規範為 MM/DD（零補齊）
-                    s = s.str.replace(r'^\s*(\d{1,2})\s*/\s*(\d{1,2})\s*$', lambda m: f"{int(m.group(1)):02d}/{int(m.group(2)):02d}", regex=True)
-                    dt = pd.to_datetime(s, format='%m/%d', errors='coerce')
-                    # 將可解析者改為 MM/DD，無法解析者維持原值
-                    formatted = dt.dt.strftime('%m/%d')
-                    df[dcol] = s.where(dt.isna(), formatted)
-            return df
+            if df.attrs.get(JOIN_KEYS_NORMALIZED):
+                return df
+            return normalize_join_keys(df.copy())
 
         cola_df = _normalize_df_for_join(cola_df)
-        set_df = _normalize_df_for_join(set_df)
-        lion_df = _normalize_df_for_join(lion_df)
-        eztravel_df = _normalize_df_for_join(eztravel_df)
-        foreign_supplier_eztravel_df = _normalize_df_for_join(foreign_supplier_eztravel_df)
-        rich_df = _normalize_df_for_join(rich_df)
-        unified_df = cola_df.merge(set_df, on=join_keys, how='left', suffixes=('', '_set'))
-        unified_df = unified_df.merge(lion_df, on=join_keys, how='left', suffixes=('', '_lion'))
-        unified_df = unified_df.merge(eztravel_df, on=join_keys, how='left', suffixes=('', '_eztravel'))
-        unified_df = unified_df.merge(foreign_supplier_eztravel_df, on=join_keys, how='left', suffixes=('', '_f_eztravel'))
-        unified_df = unified_df.merge(rich_df, on=join_keys, how='left', suffixes=('', '_rich'))
-
-        # 去除有標籤的指定欄位 (join_keys 欄位在合併後可能帶有後綴)
-        for column in join_keys:
-            if column + '_set' in unified_df.columns:
-                unified_df = unified_df.drop(columns=[column + '_set'])
-            if column + '_lion' in unified_df.columns:
-                unified_df = unified_df.drop(columns=[column + '_lion'])
-            if column + '_eztravel' in unified_df.columns:
-                unified_df = unified_df.drop(columns=[column + '_eztravel'])
-            if column + '_f_eztravel' in unified_df.columns:
-                unified_df = unified_df.drop(columns=[column + '_f_eztravel'])
-            if column + '_rich' in unified_df.columns:
-                unified_df = unified_df.drop(columns=[column + '_rich'])
-
-        # 去除剩下的標籤
-        unified_df.columns = [col.replace('_set', '').replace('_lion', '').replace('_eztravel', '').replace('_f_eztravel', '').replace('_rich', '') for col in unified_df.columns]
-
+        suppliers = [
+            (supplier, _normalize_df_for_join(supplier_df), self.supplier_value_columns(supplier))
+            for supplier, supplier_df in (('settour', set_df),
+                                          ('lion', lion_df),
+                                          ('eztravel', eztravel_df),
+                                          ('foreign_supplier_eztravel', foreign_supplier_eztravel_df),
+                                          ('rich', rich_df))
+        ]
+
+        # 以單一 64 位元複合鍵一次附加各供應商的票價與稅金（等同依序 left merge）
+        engine = SupplierJoinEngine(join_keys)
+        suppliers = self._reduce_suppliers(engine, suppliers)
+        unified_df = engine.attach(cola_df, suppliers)
+        self.join_fan_out = engine.fan_out
         return unified_df
+
+    def _reduce_suppliers(self, engine: SupplierJoinEngine, suppliers: list) -> list:
+        """
+        依 `supplier_reduction` 讓各供應商每個 join 鍵只保留一筆，避免同一航班/艙等/日期的多次爬取使 Cola 列數倍增。
+
+        作法：
+        - "latest"：依 `crawl_time` 由新到舊，保留最新一筆。
+        - "min_price"：依票價由低到高（同價再依 `crawl_time` 由新到舊），保留最低價一筆。
+        - 排序欄位以數值比較，無法轉換者視為空值排最後；縮減的筆數記錄於 `supplier_rows_reduced`。
+
+        參數：
+        - engine：本次 join 使用的 `SupplierJoinEngine`。
+        - suppliers：（供應商名稱, 供應商資料, 附加欄位）清單。
+
+        返回：
+        - list：縮減後的同格式清單；"none" 時原樣返回。
+        """
+        self.supplier_rows_reduced = {}
+        if self.supplier_reduction == 'none':
+            return suppliers
+
+        reduced = []
+        for name, supplier_df, value_columns in suppliers:
+            ranks = []
+            if self.supplier_reduction == 'min_price' and value_columns[0] in supplier_df.columns:
+                ranks.append(pd.to_numeric(supplier_df[value_columns[0]], errors='coerce').to_numpy(dtype='float64'))
+            if SUPPLIER_CRAWL_TIME_COLUMN in supplier_df.columns:
+                crawl_time = pd.to_numeric(supplier_df[SUPPLIER_CRAWL_TIME_COLUMN], errors='coerce').to_numpy(dtype='float64')
+                ranks.append(-crawl_time)
+            elif self.supplier_reduction == 'latest':
+                self.logger.warning("供應商 %s 缺少 %s 欄位，同鍵多筆時保留第一筆", name, SUPPLIER_CRAWL_TIME_COLUMN)
+            reduced_df = engine.reduce(supplier_df, ranks)
+            self.supplier_rows_reduced[name] = len(supplier_df) - len(reduced_df)
+            reduced.append((name, reduced_df, value_columns))
+        return reduced
     
+    def supplier_value_columns(self, supplier: str) -> List[str]:
+        """
+        取得供應商 join 時要附加到 Cola 的欄位（票價與稅金）。
+
+        參數：
+        - supplier：`SUPPLIER_COLUMNS` 中的供應商名稱。
+
+        返回：
+        - List[str]：欄位名稱。
+        """
+        return [self.SUPPLIER_COLUMNS[supplier]['price'], self.SUPPLIER_COLUMNS[supplier]['tax']]
+
     def _rename_columns(self, df: DataFrame) -> DataFrame:
         """
         轉換欄位為最終輸出格式，並導入 `unify_csv` 的規格化邏輯。
 
+        作法：
+        - 依輸出欄位順序先算好每一欄（放入 dict），最後一次建構 DataFrame，
+          避免自空 DataFrame 逐欄插入造成的重複配置與 block 合併。
+        - 來源缺少的欄位以有型別的空欄位補齊：數值欄位為 float64 NaN，其餘為 object None。
+
         參數：
         - df：join 後的暫存 DataFrame（中文表頭 + 供應商票價稅金欄位）。
 
         返回：
         - DataFrame：欄位命名與型態對齊的輸出。
         """
-        # 建立新的 DataFrame 來存放轉換後的資料
-        new_df = pd.DataFrame()
-        
-        # 航空公司代碼：改以航班編號解析（與 unify_csv 一致）
+        row_count = len(df)
+        columns = {}
+
+        def take(name: str, source: str, convert=None, numeric: bool = False) -> None:
+            # 來源欄位存在時（可選擇轉換後）沿用，否則補上有型別的空欄位
+            if source in df.columns:
+                columns[name] = convert(df[source]) if convert is not None else df[source]
+            else:
+                columns[name] = self._null_column(row_count, numeric)
+
+        # 航空公司代碼：改以航班編號解析（與 unify_csv 一致）；只解析不重複值，結果跨欄位快取
         for i in range(1, 4):
-            dep_fn_col = f'去程_航班編號{i}'
-            ret_fn_col = f'回程_航班編號{i}'
-            new_df[f'departure_airline_{i}'] = (
-                df[dep_fn_col].apply(self.extract_airline_code) if dep_fn_col in df.columns else None
-            )
-            new_df[f'return_airline_{i}'] = (
-                df[ret_fn_col].apply(self.extract_airline_code) if ret_fn_col in df.columns else None
-            )
-        
-        # 機場代碼轉換
+            take(f'departure_airline_{i}', f'去程_航班編號{i}', lambda s: apply_unique(s, cached_extract_airline_code))
+            take(f'return_airline_{i}', f'回程_航班編號{i}', lambda s: apply_unique(s, cached_extract_airline_code))
+
+        # 機場代碼轉換：取第一個以空白分隔的字
         for i in range(1, 4):
-            # 去程機場
-            if f'去程_出發機場{i}' in df.columns:
-                new_df[f'departure_airport_{i}'] = df[f'去程_出發機場{i}'].fillna('').astype(str).str.split().str[0]
-            else:
-                new_df[f'departure_airport_{i}'] = None
-                
-            # 去程到達機場
-            if f'去程_到達機場{i}' in df.columns:
-                new_df[f'departure_arrival_airport_{i}'] = df[f'去程_到達機場{i}'].fillna('').astype(str).str.split().str[0]
-            else:
-                new_df[f'departure_arrival_airport_{i}'] = None
-                
-            # 回程機場
-            if f'回程_出發機場{i}' in df.columns:
-                new_df[f'return_airport_{i}'] = df[f'回程_出發機場{i}'].fillna('').astype(str).str.split().str[0]
-            else:
-                new_df[f'return_airport_{i}'] = None
-                
-            # 回程到達機場
-            if f'回程_到達機場{i}' in df.columns:
-                new_df[f'return_arrival_airport_{i}'] = df[f'回程_到達機場{i}'].fillna('').astype(str).str.split().str[0]
-            else:
-                new_df[f'return_arrival_airport_{i}'] = None
-        
-        # 時間轉換：使用內部 to_time_hhmm 方法
+            take(f'departure_airport_{i}', f'去程_出發機場{i}', lambda s: apply_unique(s, cached_first_token))
+            take(f'departure_arrival_airport_{i}', f'去程_到達機場{i}', lambda s: apply_unique(s, cached_first_token))
+            take(f'return_airport_{i}', f'回程_出發機場{i}', lambda s: apply_unique(s, cached_first_token))
+            take(f'return_arrival_airport_{i}', f'回程_到達機場{i}', lambda s: apply_unique(s, cached_first_token))
+
+        # 時間轉換：以 to_time_hhmm 只解析不重複值
         for i in range(1, 4):
-            # 去程/回程出發與到達時間
-            new_df[f'departure_flight_time_{i}'] = (
-                df[f'去程_出發時間{i}'].apply(self.to_time_hhmm) if f'去程_出發時間{i}' in df.columns else None
-            )
-            new_df[f'departure_arrival_flight_time_{i}'] = (
-                df[f'去程_到達時間{i}'].apply(self.to_time_hhmm) if f'去程_到達時間{i}' in df.columns else None
-            )
-            new_df[f'return_flight_time_{i}'] = (
-                df[f'回程_出發時間{i}'].apply(self.to_time_hhmm) if f'回程_出發時間{i}' in df.columns else None
-            )
-            new_df[f'return_arrival_flight_time_{i}'] = (
-                df[f'回程_到達時間{i}'].apply(self.to_time_hhmm) if f'回程_到達時間{i}' in df.columns else None
-            )
-        
+            take(f'departure_flight_time_{i}', f'去程_出發時間{i}', lambda s: apply_unique(s, cached_to_time_hhmm))
+            take(f'departure_arrival_flight_time_{i}', f'去程_到達時間{i}', lambda s: apply_unique(s, cached_to_time_hhmm))
+            take(f'return_flight_time_{i}', f'回程_出發時間{i}', lambda s: apply_unique(s, cached_to_time_hhmm))
+            take(f'return_arrival_flight_time_{i}', f'回程_到達時間{i}', lambda s: apply_unique(s, cached_to_time_hhmm))
+
         # 機型轉換
         for i in range(1, 4):
-            # 去程機型
-            if f'去程_機型{i}' in df.columns:
-                new_df[f'departure_aircraft_type_{i}'] = df[f'去程_機型{i}']
-            else:
-                new_df[f'departure_aircraft_type_{i}'] = None
-                
-            # 回程機型
-            if f'回程_機型{i}' in df.columns:
-                new_df[f'return_aircraft_type_{i}'] = df[f'回程_機型{i}']
-            else:
-                new_df[f'return_aircraft_type_{i}'] = None
-    
-        # 行李：使用內部 split_luggage 方法拆為數值與單位
+            take(f'departure_aircraft_type_{i}', f'去程_機型{i}')
+            take(f'return_aircraft_type_{i}', f'回程_機型{i}')
+
+        # 行李：沿用 ColaTransformer 解析好的數值與單位欄位
         for i in range(1, 4):
-            dep_col = f'去程行李{i}'
-            ret_col = f'回程行李{i}'
-            if dep_col in df.columns:
-                parsed = df[dep_col].apply(self.split_luggage)
-                new_df[f'departure_luggage_value_{i}'] = parsed.apply(lambda t: t[0] if t and len(t) > 0 else None)
-                new_df[f'departure_luggage_unit_{i}'] = parsed.apply(lambda t: t[1] if t and len(t) > 1 else None)
-            else:
-                new_df[f'departure_luggage_value_{i}'] = None
-                new_df[f'departure_luggage_unit_{i}'] = None
-            if ret_col in df.columns:
-                parsed = df[ret_col].apply(self.split_luggage)
-                new_df[f'return_luggage_value_{i}'] = parsed.apply(lambda t: t[0] if t and len(t) > 0 else None)
-                new_df[f'return_luggage_unit_{i}'] = parsed.apply(lambda t: t[1] if t and len(t) > 1 else None)
-            else:
-                new_df[f'return_luggage_value_{i}'] = None
-                new_df[f'return_luggage_unit_{i}'] = None
+            for leg, prefix in (('去程', 'departure'), ('回程', 'return')):
+                value, unit = self._luggage_columns(df, leg, i)
+                columns[f'{prefix}_luggage_value_{i}'] = value if value is not None else self._null_column(row_count, numeric=True)
+                columns[f'{prefix}_luggage_unit_{i}'] = unit if unit is not None else self._null_column(row_count)
 
-        # 飛行時間：使用內部 duration_to_minutes 方法
+        # 飛行時間：以 duration_to_minutes 只解析不重複值
         for i in range(1, 4):
-            new_df[f'departure_flight_duration_{i}'] = (
-                df[f'去程_飛行時間{i}'].apply(self.duration_to_minutes) if f'去程_飛行時間{i}' in df.columns else None
-            )
-            new_df[f'return_flight_duration_{i}'] = (
-                df[f'回程_飛行時間{i}'].apply(self.duration_to_minutes) if f'回程_飛行時間{i}' in df.columns else None
-            )
-        
+            take(f'departure_flight_duration_{i}', f'去程_飛行時間{i}', lambda s: apply_unique(s, cached_duration_to_minutes), numeric=True)
+            take(f'return_flight_duration_{i}', f'回程_飛行時間{i}', lambda s: apply_unique(s, cached_duration_to_minutes), numeric=True)
+
         # 航班編號轉換
         for i in range(1, 4):
-            # 去程航班編號
-            if f'去程_航班編號{i}' in df.columns:
-                new_df[f'departure_flight_number_{i}'] = df[f'去程_航班編號{i}']
-            else:
-                new_df[f'departure_flight_number_{i}'] = None
-                
-            # 回程航班編號
-            if f'回程_航班編號{i}' in df.columns:
-                new_df[f'return_flight_number_{i}'] = df[f'回程_航班編號{i}']
-            else:
-                new_df[f'return_flight_number_{i}'] = None
-        
+            take(f'departure_flight_number_{i}', f'去程_航班編號{i}')
+            take(f'return_flight_number_{i}', f'回程_航班編號{i}')
+
         # 艙等轉換
         for i in range(1, 4):
-            # 去程艙等
-            if f'去程_艙等{i}' in df.columns:
-                new_df[f'departure_cabin_class_{i}'] = df[f'去程_艙等{i}']
-            else:
-                new_df[f'departure_cabin_class_{i}'] = None
-                
-            # 回程艙等
-            if f'回程_艙等{i}' in df.columns:
-                new_df[f'return_cabin_class_{i}'] = df[f'回程_艙等{i}']
-            else:
-                new_df[f'return_cabin_class_{i}'] = None
-        
-        # 轉機次數計算（至少為 0）
-        for col in df.columns:
-            if '航班編號' in col:
-                # 僅將空字串或全空白的字串轉為 None，其他值維持不動
-                df[col] = df[col].apply(
-                    lambda v: (np.nan if isinstance(v, str) and v.strip() == '' else v)
-                )
-        dep_legs = df[[f'去程_航班編號{i}' for i in range(1, 4)]]
-        ret_legs = df[[f'回程_航班編號{i}' for i in range(1, 4)]]
-        new_df['departure_transfer_count'] = (dep_legs.notna().sum(axis=1) - 1).clip(lower=0)
-        new_df['return_transfer_count'] = (ret_legs.notna().sum(axis=1) - 1).clip(lower=0)
-
-        # GDS類型轉換
-        new_df['gds_type'] = df['GDS_Type']
-        
-        # 價格相關欄位轉換
-        new_df['ticket_price'] = df['機票價錢']
-        new_df['ticket_price_markup_percentage'] = df['機票價錢加價成數']
-        new_df['tax'] = df['稅金']
-        new_df['tax_markup_percentage'] = df['稅金加價成數']
-        new_df['final_price'] = df['最終價格']
-        
-        # 日期轉換：保留中文來源並標準化為 YYYY/MM/DD；建立時間沿用原值
-        new_df['departure_date'] = df['出發日期']
-        new_df['return_date'] = df['返回日期']
-        new_df['creation_time'] = df['建立時間']
-        
-        # 其他供應商價格和稅金
-        supplier_mapping = {
-            'ezfly':                     {'price': 'ezfly_ticket_price', 
-                                          'tax': 'ezfly_tax',
-                                          'tax_markup_percentage': 'ezfly_tax_markup_percentage'},
-            'eztravel':                  {'price': 'eztravel_ticket_air_tickets_price', 
-                                          'tax': 'eztravel_tax',
-                                          'tax_markup_percentage': 'eztravel_tax_markup_percentage'},
-            'foreign_supplier_eztravel': {'price': 'foreign_supplier_eztraval_ticket_air_tickets_price', 
-                                          'tax': 'foreign_supplier_eztraval_tax',
-                                          'tax_markup_percentage': 'foreign_supplier_eztraval_tax_markup_percentage'},
-            'lion':                      {'price': 'lion_air_tickets_price', 
-                                          'tax': 'lion_tax',
-                                          'tax_markup_percentage': 'lion_tax_markup_percentage'},
-            'settour':                   {'price': 'settour_air_tickets_price', 
-                                          'tax': 'settour_tax',
-                                          'tax_markup_percentage': 'settour_tax_markup_percentage'},
-            'rich':                      {'price': 'rich_mond_air_tickets_price', 
-                                          'tax': 'rich_mond_tax',
-                                          'tax_markup_percentage': 'rich_mond_tax_markup_percentage'}
-        }
-        
-        for supplier, columns in supplier_mapping.items():
-            # 票價
-            if columns['price'] in df.columns:
-                new_df[columns['price']] = df[columns['price']].apply(lambda x: int(x) if pd.notnull(x) and np.isfinite(x) else x)
-            else:
-                new_df[columns['price']] = None
-                
-            # 稅金
-            if columns['tax'] in df.columns:
-                new_df[columns['tax']] = df[columns['tax']].apply(lambda x: int(x) if pd.notnull(x) and np.isfinite(x) else x)
-            else:
-                new_df[columns['tax']] = None
-        
-        # 淨價或票面轉換
-        new_df['net_price_or_ticket_price'] = df['淨價或票面']
+            take(f'departure_cabin_class_{i}', f'去程_艙等{i}')
+            take(f'return_cabin_class_{i}', f'回程_艙等{i}')
+
+        # 轉機次數計算（至少為 0）：空值與空字串（或全空白）的航班編號不計入
+        for leg, prefix in (('去程', 'departure'), ('回程', 'return')):
+            leg_count = sum(
+                self._has_flight_number(df[col]) for col in (f'{leg}_航班編號{i}' for i in range(1, 4)) if col in df.columns
+            )
+            columns[f'{prefix}_transfer_count'] = (pd.Series(leg_count, index=df.index, dtype='int64') - 1).clip(lower=0)
 
-        # 票價規則類型
-        new_df['ticket_rule_type'] = df['票價規則類型']
+        # GDS類型、價格相關欄位、日期與建立時間沿用原值
+        for name, source in self.PASSTHROUGH_COLUMNS:
+            columns[name] = df[source]
 
-        # KP
-        new_df['kp'] = df['KP']
+        # 其他供應商價格和稅金：有限值截去小數
+        for columns_by_kind in self.SUPPLIER_COLUMNS.values():
+            for kind in ('price', 'tax'):
+                take(columns_by_kind[kind], columns_by_kind[kind], self._truncate_to_int, numeric=True)
 
-        # 折扣
-        new_df['discount'] = df['折扣']
+        # 淨價或票面、票價規則類型、KP、折扣、固定公司要賺的利潤
+        for name, source in self.TRAILING_COLUMNS:
+            columns[name] = df[source]
 
-        # 固定公司要賺的利潤
-        new_df['activity_fee_adjustment'] = df['固定金額']
+        return pd.DataFrame(columns, index=df.index, copy=False)
+
+    @staticmethod
+    def _null_column(row_count: int, numeric: bool = False) -> np.ndarray:
+        """
+        建立有型別的空欄位：數值欄位為 float64 NaN，其餘為 object None。
+        """
+        if numeric:
+            return np.full(row_count, np.nan, dtype='float64')
+        return np.full(row_count, None, dtype=object)
 
-        return new_df
+    @staticmethod
+    def _has_flight_number(series: pd.Series) -> np.ndarray:
+        """
+        判斷航班編號欄位每列是否有值（非空值且非空字串或全空白），返回 0/1；只檢查不重複值。
+        """
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        present = np.array([0 if isinstance(value, str) and value.strip() == '' else 1 for value in uniques] + [0], dtype='int64')
+        return present[codes]
+
+    @staticmethod
+    def _truncate_to_int(series: pd.Series) -> pd.Series:
+        """
+        將票價/稅金的有限值截去小數（等同逐值 `int(x)`），空值與無限值保留；
+        整欄皆為有限值時轉為 int64。
+        """
+        numeric = pd.to_numeric(series)
+        truncated = np.trunc(numeric)
+        if len(truncated) and np.isfinite(truncated).all():
+            return truncated.astype('int64')
+        return truncated
+
+    def _luggage_columns(self, df: DataFrame, leg: str, i: int):
+        """
+        取得某段行李的數值與單位欄位。
+
+        參數：
+        - df：join 後的暫存 DataFrame。
+        - leg：'去程' 或 '回程'。
+        - i：航段序號（1~3）。
+
+        返回：
+        - Tuple：（數值欄位, 單位欄位）；優先使用 `{leg}行李數值{i}`／`{leg}行李單位{i}`，
+          若只有原始 `{leg}行李{i}` 字串欄位則以 `parse_luggage` 解析，皆無時為 (None, None)（由呼叫端補上空欄位）。
+        """
+        value_col, unit_col, raw_col = f'{leg}行李數值{i}', f'{leg}行李單位{i}', f'{leg}行李{i}'
+        if value_col in df.columns and unit_col in df.columns:
+            return df[value_col], df[unit_col]
+        if raw_col in df.columns:
+            return parse_luggage(df[raw_col])
+        return None, None
 
     def _remove_no_tax_data(self, df: DataFrame) -> DataFrame:
         """
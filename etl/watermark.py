@@ -0,0 +1,69 @@
+# 標準庫
+import json
+import os
+import threading
+from typing import Dict, Optional, Union
+
+class WatermarkStore:
+    """
+    WatermarkStore 類別以 JSON 檔保存各來源的增量提取水位線（已處理的最大時間戳，epoch 秒）。
+
+    屬性:
+        path (str): 水位線檔案路徑；檔案不存在時視為沒有任何水位線。
+
+    方法:
+        get(source: str) -> Optional[Union[int, float]]: 取得來源的水位線。
+        update(watermarks: Dict[str, Union[int, float]]): 合併並寫回水位線（只前進不後退）。
+    """
+    def __init__(self, path: str):
+        """
+        初始化 WatermarkStore 物件。
+
+        參數:
+            path (str): 水位線檔案路徑，例如掛載於持久化磁碟或 GCS FUSE 的位置。
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Union[int, float]]:
+        """
+        讀取全部水位線。
+
+        返回:
+            Dict[str, Union[int, float]]: 來源名稱對應水位線。
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def get(self, source: str) -> Optional[Union[int, float]]:
+        """
+        取得來源的水位線。
+
+        參數:
+            source (str): 來源名稱。
+
+        返回:
+            Optional[Union[int, float]]: 水位線；尚未記錄時為 None。
+        """
+        return self.load().get(source)
+
+    def update(self, watermarks: Dict[str, Union[int, float]]):
+        """
+        合併新的水位線並以原子方式寫回檔案；每個來源只取較大值，避免水位線倒退。
+
+        參數:
+            watermarks (Dict[str, Union[int, float]]): 來源名稱對應本次所見的最大時間戳。
+        """
+        with self._lock:
+            merged = self.load()
+            for source, value in watermarks.items():
+                merged[source] = max(value, merged.get(source, value))
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from etl.transform.cola_transformer import ColaTransformer
+
+
+def _raw(rows):
+    return pd.DataFrame({
+        '去程航班編號1': [f'BR{100 + i}' for i in range(rows)],
+        '回程航班編號1': [f'BR{200 + i}' for i in range(rows)],
+        '去程艙等與艙等編碼1': ['經濟艙(Y)'] * rows,
+        '回程艙等與艙等編碼1': ['經濟艙(Y)'] * rows,
+        '去程起飛時間1': ['2025/01/01 08:00'] * rows,
+        '回程起飛時間1': ['2025/01/05 08:00'] * rows,
+        '總售價': [1000 + i for i in range(rows)],
+    })
+
+
+def test_missing_creation_time_is_the_same_across_chunks():
+    transformer = ColaTransformer(run_timestamp=1_700_000_000)
+    raw = _raw(6)
+
+    whole = transformer.clean_data(raw)
+    chunked = pd.concat([transformer.clean_data(raw.iloc[:3].reset_index(drop=True)),
+                         transformer.clean_data(raw.iloc[3:].reset_index(drop=True))], ignore_index=True)
+
+    assert whole['建立時間'].tolist() == [1_700_000_000] * len(whole)
+    assert chunked['建立時間'].tolist() == whole['建立時間'].tolist()
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from etl.extractor import Extractor
+from etl.watermark import WatermarkStore
+
+
+def _extractor(tmp_path, watermarks):
+    store = WatermarkStore(str(tmp_path / 'watermarks.json'))
+    store.update(watermarks)
+    return Extractor(project_id='p', client=object(), snapshot_timestamp=100_000, watermark_store=store)
+
+
+def test_only_cola_uses_watermark(tmp_path):
+    extractor = _extractor(tmp_path, {'cola': 99_000, 'set': 99_500})
+
+    assert extractor.lower_bound('cola') == 99_000
+    # 供應商來源一律使用完整時間窗口，才能對到先前爬取的價格
+    assert extractor.lower_bound('set') == extractor.window_start
+
+
+def test_observe_records_only_incremental_sources(tmp_path):
+    extractor = _extractor(tmp_path, {})
+
+    extractor._observe('cola', pd.DataFrame({'建立時間': [99_100.5, 99_200.0]}))
+    extractor._observe('set', pd.DataFrame({'crawl_time': [99_300]}))
+
+    assert extractor.observed_watermarks == {'cola': 99_200}
+
+
+def test_sequential_extraction_records_watermark(tmp_path, monkeypatch):
+    extractor = _extractor(tmp_path, {})
+    monkeypatch.setattr(extractor, 'fetch_data_as_dataframe',
+                        lambda query, label=None: pd.DataFrame({'建立時間': [99_100, 99_400]}))
+
+    extractor.extract_cola_data()
+
+    assert extractor.observed_watermarks == {'cola': 99_400}
@@ -0,0 +1,134 @@
+import logging
+import threading
+
+import pandas as pd
+
+from etl.loader import MAX_IDENTIFIER_BYTES, Loader, _suffixed_name
+from etl.schema import coerce_to_schema
+
+
+class _StubResult:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+
+class _StubConnection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, statement, parameters=None):
+        with self.engine.lock:
+            self.engine.executed.append((str(statement), parameters))
+        return _StubResult(len(parameters) if parameters is not None else 0)
+
+
+class _StubEngine:
+    """
+    只記錄執行的 SQL 與參數的引擎替身（可由多個執行緒同時使用）。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executed = []
+
+    def begin(self):
+        return _StubConnection(self)
+
+
+def _stub_loader(**kwargs):
+    loader = Loader.__new__(Loader)
+    loader.method = kwargs.get('method', 'insert')
+    loader.batch_rows = kwargs.get('batch_rows', 0)
+    loader.batch_target_seconds = 2.0
+    loader.mode = 'truncate'
+    loader.parallelism = kwargs.get('parallelism', 2)
+    loader.logger = logging.getLogger(__name__)
+    loader.engine = _StubEngine()
+    return loader
+
+
+def _frame(rows):
+    return coerce_to_schema(pd.DataFrame({
+        'departure_flight_number_1': [f'BR{i:03d}' for i in range(rows)],
+        'departure_cabin_class_1': ['Y'] * rows,
+        'departure_date': ['2025-01-01'] * rows,
+        'departure_transfer_count': [0] * rows,
+        'return_transfer_count': [0] * rows,
+        'gds_type': ['1A'] * rows,
+        'ticket_price': range(rows),
+        'creation_time': [1.0] * rows,
+    }))
+
+
+def test_write_in_parallel_writes_every_row_once():
+    loader = _stub_loader(parallelism=2)
+    df = _frame(50)
+
+    loader._write_in_parallel(df, 'domanda.target')
+
+    statements = [(sql, params) for sql, params in loader.engine.executed if 'INSERT INTO domanda.target' in sql]
+    assert len(statements) == 2
+    written = sorted(row['departure_flight_number_1'] for _, params in statements for row in params)
+    assert written == sorted(df['departure_flight_number_1'].tolist())
+
+
+def test_write_in_parallel_partitions_by_business_key():
+    loader = _stub_loader(parallelism=2)
+    df = pd.concat([_frame(20), _frame(20)], ignore_index=True)
+
+    loader._write_in_parallel(df, 'domanda.target')
+
+    # 業務鍵相同的資料列落在同一分區
+    for _, params in loader.engine.executed:
+        keys = [row['departure_flight_number_1'] for row in params]
+        assert all(keys.count(key) == 2 for key in keys)
+
+
+def test_write_rows_uses_partitions_with_batches():
+    loader = _stub_loader(parallelism=2, batch_rows=7)
+    df = _frame(30)
+
+    loader._write_rows(df, 'domanda.target')
+
+    assert sum(len(params) for _, params in loader.engine.executed) == 30
+
+
+def test_upsert_load_replaces_keys_and_expires_in_one_transaction():
+    loader = _stub_loader(parallelism=1)
+
+    loader.upsert_load(_frame(5), expire_before=1_000.0)
+
+    statements = [sql for sql, _ in loader.engine.executed]
+    replace = next(i for i, sql in enumerate(statements) if sql.startswith('DELETE FROM domanda.flight_ticket_price_compare t USING'))
+    expire = next(i for i, sql in enumerate(statements) if 'creation_time <= :expire_before' in sql)
+    insert = next(i for i, sql in enumerate(statements) if sql.startswith('INSERT INTO domanda.flight_ticket_price_compare ('))
+    assert replace < expire < insert
+
+
+def test_upsert_load_without_new_rows_only_expires():
+    loader = _stub_loader(parallelism=1)
+
+    loader.upsert_load(_frame(0), expire_before=1_000.0)
+
+    statements = [sql for sql, _ in loader.engine.executed]
+    assert any('creation_time <= :expire_before' in sql for sql in statements)
+    assert not any(sql.startswith('INSERT') for sql in statements)
+
+
+def test_suffixed_name_fits_identifier_limit():
+    short = 'flight_ticket_price_compare_pkey'
+    long_a = 'idx_flight_ticket_price_compare_departure_date_return_date_cabin'
+    long_b = 'idx_flight_ticket_price_compare_departure_date_return_date_cabix'
+
+    assert _suffixed_name(short, '_new') == short + '_new'
+    assert _suffixed_name(short, '') == short
+    for suffix in ('_new', '_previous'):
+        assert len(_suffixed_name(long_a, suffix).encode('utf-8')) <= MAX_IDENTIFIER_BYTES
+        assert _suffixed_name(long_a, suffix).endswith(suffix)
+        assert _suffixed_name(long_a, suffix) != _suffixed_name(long_b, suffix)